@@ -26,7 +26,18 @@ def _get_version_from_pyproject():
     # Fallback version if pyproject.toml can't be read
     return "1.0.1"
 
-__version__ = _get_version_from_pyproject()
+def _get_version():
+    """Get version from installed package metadata, falling back to pyproject.toml."""
+    try:
+        # Installed packages already carry the version in their dist-info, so
+        # there's no need to read and regex-scan pyproject.toml on every import
+        from importlib.metadata import version
+        return version("gzip-up")
+    except Exception:
+        # Not installed (e.g. running from a source checkout)
+        return _get_version_from_pyproject()
+
+__version__ = _get_version()
 __author__ = "Rauf Salamzade"
 __email__ = "salamzader@gmail.com"
 
@@ -2,22 +2,176 @@
 File operations for scanning directories and generating task files.
 """
 
+import gzip
+import heapq
+import importlib.util
 import os
+import queue
+import shutil
+import stat
 import subprocess
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Set
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set, Tuple
 
-from .utils import print_status, print_progress
+from .utils import print_status, print_progress, print_counter
 
 
-def find_files_with_suffixes(directory: str, suffixes: Set[str]) -> List[str]:
+# Minimum seconds between progress bar redraws in per-file loops
+PROGRESS_INTERVAL = 0.1
+
+# Task file lines are encoded into a bytearray and written whenever it
+# reaches this size. Blocks this large bypass the file object's own buffer,
+# so each is a single write(2). Task files are never fsync'ed: the command
+# list can be regenerated from the inputs, so durability isn't worth a sync
+# round trip (which is especially slow on NFS-backed home directories)
+TASK_FILE_BUFFER_SIZE = 1 << 20
+
+# Maximum files handed to a single gzip/pigz invocation in --local-run
+EXEC_BATCH_SIZE = 64
+
+# ISA-L only supports levels 0-3; 2 is its default
+ISAL_COMPRESSLEVEL = 2
+
+# Suffixes of files that are already gzip-compressed and are skipped in gzip
+# mode (.bgz is BGZF, the blocked gzip used for indexed genomics files)
+GZIP_SUFFIXES = ('.gz', '.bgz', '.gzip')
+
+
+def _isal_level(compresslevel: int) -> int:
+    """
+    Map a gzip level (1-9) onto ISA-L's 0-3.
+    
+    The levels are spread evenly and in order: 1-3 -> 0, 4-5 -> 1,
+    6-7 -> 2 (so gzip's default 6 lands on ISA-L's default) and 8-9 -> 3.
+    """
+    return (compresslevel - 1) * 4 // 9
+
+
+def _scan_directory(path: bytes, suffix_tuple: tuple, collect_gz: bool, collect_sizes: bool = False) -> tuple:
+    """
+    List a single directory with os.scandir.
+    
+    Directory/file classification comes from the cached dirent type instead
+    of an extra stat() per entry. Only regular files (or symlinks to them)
+    are counted and matched; symlinked directories are not followed. An
+    unreadable directory yields nothing, like os.walk. The directory is
+    scanned by its bytes path so entry names are never decoded; only
+    matching paths are turned back into str. With collect_sizes, matching
+    files are stat'ed here, once, so later steps don't have to stat them
+    again.
+    
+    Returns:
+        Tuple of (bytes subdirectories, matching paths, sizes of the matching
+        paths (empty unless collect_sizes), .gz paths, number of files)
+    """
+    subdirs = []
+    matches = []
+    sizes = []
+    gz_paths = []
+    file_count = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                # Symlinks to directories, FIFOs and sockets are neither
+                # walked nor matched
+                if not entry.is_file():
+                    continue
+                file_count += 1
+                if entry.name.endswith(suffix_tuple):
+                    matches.append(os.fsdecode(entry.path))
+                    if collect_sizes:
+                        try:
+                            # Follow symlinks so the size matches os.stat's
+                            sizes.append(entry.stat().st_size)
+                        except OSError:
+                            sizes.append(0)
+                if collect_gz and entry.name.endswith(b'.gz'):
+                    gz_paths.append(os.fsdecode(entry.path))
+    except OSError:
+        pass
+    return subdirs, matches, sizes, gz_paths, file_count
+
+
+def _scan_tree(directory: bytes, suffix_tuple: tuple, collect_gz: bool, scan_threads: int = 1, collect_sizes: bool = False):
+    """
+    Walk directory, yielding (matching paths, sizes, .gz paths, number of files) per directory.
+    
+    With scan_threads > 1, directories are listed concurrently by a fixed
+    set of worker threads pulling from a shared queue, so several readdir
+    calls are in flight at once. This mostly pays off on network filesystems
+    (NFS, Lustre, SMB) where every listing is a round trip to the server.
+    """
+    if scan_threads <= 1:
+        stack = [directory]
+        while stack:
+            subdirs, matches, sizes, gz_paths, file_count = _scan_directory(stack.pop(), suffix_tuple, collect_gz, collect_sizes)
+            stack.extend(subdirs)
+            yield matches, sizes, gz_paths, file_count
+        return
+    
+    work = queue.SimpleQueue()
+    results = queue.SimpleQueue()
+    
+    def worker():
+        while True:
+            path = work.get()
+            if path is None:
+                return
+            try:
+                results.put(_scan_directory(path, suffix_tuple, collect_gz, collect_sizes))
+            except BaseException as e:
+                results.put(e)
+    
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(scan_threads)]
+    for thread in threads:
+        thread.start()
+    
+    # Directories queued or being listed; only this thread updates it, so
+    # the walk is done once it drops to zero
+    outstanding = 1
+    work.put(directory)
+    try:
+        while outstanding:
+            result = results.get()
+            outstanding -= 1
+            if isinstance(result, BaseException):
+                raise result
+            subdirs, matches, sizes, gz_paths, file_count = result
+            for subdir in subdirs:
+                work.put(subdir)
+            outstanding += len(subdirs)
+            yield matches, sizes, gz_paths, file_count
+    finally:
+        # Drop unstarted work if the walk was cut short, then stop the workers
+        try:
+            while True:
+                work.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in threads:
+            work.put(None)
+
+
+def find_files_with_suffixes(directory: str, suffixes: Set[str], existing_gz: Optional[Set[str]] = None, sort: bool = False, scan_threads: int = 1, file_sizes: Optional[Dict[str, int]] = None) -> List[str]:
     """
     Recursively find all files with the specified suffixes in the directory.
     
     Args:
         directory: Root directory to search
         suffixes: Set of file suffixes to look for
+        existing_gz: Optional set that is filled with the paths of every .gz
+            file seen during the scan, so later skip checks need no stat()
+        sort: Return the paths sorted (default: scan order, which avoids an
+            O(N log N) sort that task generation doesn't need)
+        scan_threads: Number of directories to list concurrently (default: 1)
+        file_sizes: Optional dict that is filled with the size of every
+            matching file, stat'ed by the scan threads, so the summary and
+            task ordering need no further stat()
         
     Returns:
         List of file paths matching the suffixes
@@ -27,32 +181,84 @@ def find_files_with_suffixes(directory: str, suffixes: Set[str]) -> List[str]:
     print_status(f"Scanning directory: {os.path.abspath(directory)}")
     print_status(f"Looking for suffixes: {', '.join(sorted(suffixes))}")
     
+    # endswith accepts a tuple and checks every suffix in one C call; the
+    # suffixes are encoded to match the bytes names from the scan
+    suffix_tuple = tuple(os.fsencode(suffix) for suffix in suffixes)
+    
     try:
-        # Count total files for progress tracking
-        total_files = sum(len(files) for _, _, files in os.walk(directory))
+        # Single pass over the tree: the total is unknown, so show a running
+        # count and only redraw it each time another 1024 files have been seen
         scanned_files = 0
+        collect_gz = existing_gz is not None
+        collect_sizes = file_sizes is not None
+        for matches, sizes, gz_paths, file_count in _scan_tree(os.fsencode(directory), suffix_tuple, collect_gz, scan_threads, collect_sizes):
+            previous = scanned_files
+            scanned_files += file_count
+            if scanned_files >> 10 != previous >> 10:
+                print_counter(scanned_files, "Scanning files")
+            
+            matching_files.extend(matches)
+            if collect_sizes:
+                file_sizes.update(zip(matches, sizes))
+            if collect_gz:
+                existing_gz.update(gz_paths)
         
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                scanned_files += 1
-                print_progress(scanned_files, total_files, "Scanning files")
-                
-                file_path = os.path.join(root, file)
-                # Check if file ends with any of the specified suffixes
-                if any(file.endswith(suffix) for suffix in suffixes):
-                    matching_files.append(file_path)
-        
-        print()  # Clear progress bar
-        print_status(f"Scan complete! Found {len(matching_files)} matching files out of {total_files} total files")
+        print_counter(scanned_files, "Scanning files")
+        print()  # Clear progress counter
+        print_status(f"Scan complete! Found {len(matching_files)} matching files out of {scanned_files} total files")
         
     except Exception as e:
         print(f"\n[ERROR] Error scanning directory {directory}: {e}")
         return []
     
-    return sorted(matching_files)
+    if sort:
+        matching_files.sort()
+    return matching_files
+
+
+def _largest_first(files: List[str], file_sizes: Optional[Dict[str, int]] = None) -> List[Tuple[int, str]]:
+    """
+    Return (size, path) pairs for files, largest first.
+    
+    Sizes come from file_sizes when the scan recorded them, otherwise from
+    os.stat. Files that can't be stat'ed count as empty. Files of equal size
+    are ordered by path, so the result doesn't depend on the scan order
+    (which varies between runs with scan_threads > 1).
+    """
+    sized = []
+    for file_path in files:
+        size = file_sizes.get(file_path) if file_sizes is not None else None
+        if size is None:
+            try:
+                size = os.stat(file_path).st_size
+            except OSError:
+                size = 0
+        sized.append((size, file_path))
+    sized.sort(key=lambda item: (-item[0], item[1]))
+    return sized
+
+
+def _partition_by_size(files: List[str], num_chunks: int, file_sizes: Optional[Dict[str, int]] = None) -> List[List[str]]:
+    """
+    Split files into num_chunks groups with roughly equal total bytes.
+    
+    Greedy longest-processing-time partition: files are taken largest first
+    and each goes to the group with the fewest bytes so far (ties broken by
+    file count). Compression time tracks input size, so this keeps the
+    slowest array task, which sets the job's wall time, close to the mean.
+    Files that can't be stat'ed count as empty.
+    """
+    chunks = [[] for _ in range(num_chunks)]
+    heap = [(0, 0, i) for i in range(num_chunks)]
+    for size, file_path in _largest_first(files, file_sizes):
+        total, count, i = heapq.heappop(heap)
+        chunks[i].append(file_path)
+        heapq.heappush(heap, (total + size, count + 1, i))
+    
+    return chunks
 
 
-def generate_task_file(files: List[str], output_file: str = "gzip.cmds", max_jobs: int = None, operation_mode: str = "gzip", mode_args = None) -> str:
+def generate_task_file(files: List[str], output_file: str = "gzip.cmds", max_jobs: int = None, operation_mode: str = "gzip", mode_args = None, existing_gz: Optional[Set[str]] = None, gzip_command: str = "gzip", file_sizes: Optional[Dict[str, int]] = None) -> Tuple[str, int, bool]:
     """
     Generate a task file with commands for the found files based on operation mode.
     
@@ -62,127 +268,360 @@ def generate_task_file(files: List[str], output_file: str = "gzip.cmds", max_job
         max_jobs: Maximum number of jobs for chunking (optional)
         operation_mode: Operation mode ("gzip", "gunzip", "sam_to_bam", "bam_to_sam")
         mode_args: Additional arguments for the mode (optional)
+        existing_gz: Paths of .gz files already known to exist (optional)
+        gzip_command: Compression command for gzip mode, e.g. "pigz -p 4"
+            (default: gzip)
+        file_sizes: File sizes recorded during the scan (optional); files
+            missing from it are stat'ed
         
     Returns:
-        Path to the generated task file
+        Tuple of (path to the generated task file, number of task lines
+        written, whether the lines are chunked)
     """
     task_file_path = os.path.abspath(output_file)
     
     print_status(f"Generating task file: {task_file_path}")
     
-    # If chunking is needed and there are more than max_jobs files
-    if max_jobs and len(files) > max_jobs:
-        print_status(f"More than {max_jobs} files detected, creating chunked version for SLURM compatibility", "[INFO]")
+    # Drop files that should be skipped based on mode first, so skipped files
+    # neither trigger chunking nor leave short or empty chunks behind
+    processable_files = filter_processable_files(files, operation_mode, existing_gz)
+    skipped_count = len(files) - len(processable_files)
+    
+    # Chunk only if there are more than max_jobs files to process
+    if max_jobs and len(processable_files) > max_jobs:
+        print_status(f"More than {max_jobs} files to process, creating chunked version for SLURM compatibility", "[INFO]")
         
-        # Calculate optimal chunking
-        commands_per_job = max(1, (len(files) + max_jobs - 1) // max_jobs)
-        actual_jobs = (len(files) + commands_per_job - 1) // commands_per_job
+        # Calculate optimal chunking. Both divisions are ceilings:
+        # commands_per_job = ceil(n / max_jobs) keeps the array within the
+        # SLURM limit, and actual_jobs = ceil(n / commands_per_job) is the
+        # number of array tasks needed, which is therefore <= max_jobs.
+        # Files are then spread over the chunks by size, so commands_per_job
+        # is the average rather than an exact count.
+        total_commands = len(processable_files)
+        commands_per_job = max(1, (total_commands + max_jobs - 1) // max_jobs)
+        actual_jobs = (total_commands + commands_per_job - 1) // commands_per_job
         
         print_status(f"Restructuring for SLURM array limit: {max_jobs} max jobs", "[INFO]")
-        print_status(f"Files to compress: {len(files)}", "[INFO]")
+        print_status(f"Files to compress: {total_commands}", "[INFO]")
         print_status(f"Jobs to submit: {actual_jobs}", "[INFO]")
-        print_status(f"Commands per job: {commands_per_job}", "[INFO]")
+        print_status(f"Commands per job: ~{commands_per_job} (balanced by file size)", "[INFO]")
         
-        with open(task_file_path, 'w') as f:
-            mode_description = get_mode_description(operation_mode)
-            f.write(f"# {mode_description} task file generated by gzip-up.py (chunked mode)\n")
-            f.write("# Each line contains multiple commands separated by semicolons\n")
-            f.write("# Run with Slurm job arrays - each task processes multiple files\n\n")
-            
-            skipped_count = 0
-            for i in range(0, len(files), commands_per_job):
-                chunk = files[i:i + commands_per_job]
+        mode_description = get_mode_description(operation_mode)
+        header = (
+            f"# {mode_description} task file generated by gzip-up.py (chunked mode)\n"
+            "# Each line contains multiple commands separated by semicolons\n"
+            "# Run with Slurm job arrays - each task processes multiple files\n\n"
+        )
+        
+        with open(task_file_path, 'wb', buffering=TASK_FILE_BUFFER_SIZE) as f:
+            buf = bytearray(header.encode())
+            last_update = 0.0
+            written = 0
+            lines_written = 0
+            for chunk in _partition_by_size(processable_files, actual_jobs, file_sizes):
+                # Build commands for this chunk based on mode
                 chunk_commands = []
-                
                 for file_path in chunk:
-                    # Skip if file should be skipped based on mode
-                    if should_skip_file(file_path, operation_mode):
-                        skipped_count += 1
-                        continue
-                    
-                    # Add command to chunk based on mode
-                    command = generate_command(file_path, operation_mode, mode_args)
+                    command = generate_command(file_path, operation_mode, mode_args, gzip_command)
                     if command:
                         chunk_commands.append(command)
                 
-                # Write chunk if it contains any commands
+                # Queue chunk if it contains any commands
                 if chunk_commands:
-                    combined_cmd = "; ".join(chunk_commands)
-                    f.write(f"{combined_cmd}\n")
+                    buf += ("; ".join(chunk_commands) + "\n").encode('utf-8', 'surrogateescape')
+                    lines_written += 1
+                    if len(buf) >= TASK_FILE_BUFFER_SIZE:
+                        f.write(buf)
+                        buf.clear()
                 
-                # Show progress
-                print_progress(i + len(chunk), len(files), "Writing chunked commands")
-            
-            print()  # Clear progress bar
+                # Show progress, throttled so terminal I/O doesn't dominate
+                written += len(chunk)
+                now = time.monotonic()
+                if now - last_update >= PROGRESS_INTERVAL or written == total_commands:
+                    print_progress(written, total_commands, "Writing chunked commands")
+                    last_update = now
             
-            if skipped_count > 0:
-                print_status(f"Skipped {skipped_count} files that don't need processing", "[WARN]")
-            
-            print_status(f"Chunked task file created with {actual_jobs} job chunks", "[OK]")
-            return task_file_path
+            f.write(buf)
+        
+        print()  # Clear progress bar
+        
+        if skipped_count > 0:
+            print_status(f"Skipped {skipped_count} files that don't need processing", "[WARN]")
+        
+        print_status(f"Chunked task file created with {lines_written} job chunks", "[OK]")
+        return task_file_path, lines_written, True
     
     # Standard non-chunked mode
-    with open(task_file_path, 'w') as f:
-        mode_description = get_mode_description(operation_mode)
-        f.write(f"# {mode_description} task file generated by gzip-up.py\n")
-        f.write("# Each line contains a command to process a file\n")
-        f.write("# Run with: parallel < gzip.cmds\n")
-        f.write("# Or use with Slurm: srun --multi-prog gzip.cmds\n\n")
-        
-        skipped_count = 0
-        for i, file_path in enumerate(files):
-            # Skip if file should be skipped based on mode
-            if should_skip_file(file_path, operation_mode):
-                skipped_count += 1
-                continue
-                
+    mode_description = get_mode_description(operation_mode)
+    header = (
+        f"# {mode_description} task file generated by gzip-up.py\n"
+        "# Each line contains a command to process a file\n"
+        "# Run with: parallel < gzip.cmds\n"
+        "# Or use with Slurm: srun --multi-prog gzip.cmds\n\n"
+    )
+    
+    # Write the largest files first. Array tasks and parallel start lines in
+    # order, so a big file found late can't leave one straggler running
+    # after everything else has finished.
+    processable_files = [file_path for _, file_path in _largest_first(processable_files, file_sizes)]
+    
+    # Lines are encoded into a bytearray and written in 1 MiB blocks rather
+    # than one text-mode write per command. surrogateescape keeps file names
+    # that aren't valid UTF-8 byte-for-byte intact.
+    with open(task_file_path, 'wb', buffering=TASK_FILE_BUFFER_SIZE) as f:
+        buf = bytearray(header.encode())
+        last_update = 0.0
+        commands_written = 0
+        for i, file_path in enumerate(processable_files, 1):
             # Create command based on mode
-            command = generate_command(file_path, operation_mode, mode_args)
+            command = generate_command(file_path, operation_mode, mode_args, gzip_command)
             if command:
-                f.write(f"{command}\n")
+                buf += f"{command}\n".encode('utf-8', 'surrogateescape')
+                commands_written += 1
+                if len(buf) >= TASK_FILE_BUFFER_SIZE:
+                    f.write(buf)
+                    buf.clear()
             
-            # Show progress
-            print_progress(i + 1, len(files), "Writing commands")
+            # Show progress, throttled so terminal I/O doesn't dominate
+            now = time.monotonic()
+            if now - last_update >= PROGRESS_INTERVAL or i == len(processable_files):
+                print_progress(i, len(processable_files), "Writing commands")
+                last_update = now
+        
+        f.write(buf)
     
     print()  # Clear progress bar
     
-    commands_written = len(files) - skipped_count
     if skipped_count > 0:
         print_status(f"Skipped {skipped_count} files that don't need processing", "[WARN]")
     
     print_status(f"Task file created with {commands_written} commands", "[OK]")
     
-    return task_file_path
+    return task_file_path, commands_written, False
+
+
+def compress_file_inprocess(file_path: str, compresslevel: int = 6, gzip_module=gzip) -> str:
+    """
+    Compress a file in-process, equivalent to running `gzip file_path`.
+    
+    The compressed data is written to file_path + '.gz' (which must not
+    already exist), permissions, timestamps and (where allowed) ownership are
+    copied over, and the original file is removed. Like gzip, symlinks, other non-regular files
+    and files with more than one hard link are refused with ValueError.
+    
+    Args:
+        file_path: Path of the file to compress
+        compresslevel: DEFLATE level (default: 6, same as gzip)
+        gzip_module: Module providing GzipFile, e.g. isal.igzip (default: gzip)
+        
+    Returns:
+        Path to the compressed file
+    """
+    gz_path = f"{file_path}.gz"
+    
+    # lstat first: opening a FIFO would block, and a symlink must not be followed
+    st = os.lstat(file_path)
+    if not stat.S_ISREG(st.st_mode):
+        raise ValueError(f"{file_path} is not a directory or a regular file - ignored")
+    if st.st_nlink > 1:
+        raise ValueError(f"{file_path} has {st.st_nlink - 1} other link{'s' if st.st_nlink > 2 else ''} -- file ignored")
+    
+    # O_NOFOLLOW closes the window between the lstat and the open
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    with os.fdopen(fd, 'rb') as src, open(gz_path, 'xb') as raw:
+        try:
+            mtime = int(st.st_mtime)
+            with gzip_module.GzipFile(filename=os.path.basename(file_path), mode='wb',
+                               compresslevel=compresslevel, fileobj=raw, mtime=mtime) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        except BaseException:
+            # Never leave a truncated .gz behind
+            os.unlink(gz_path)
+            raise
+    
+    shutil.copystat(file_path, gz_path)
+    try:
+        # Keep the owner like gzip does; only root can give files away
+        os.chown(gz_path, st.st_uid, st.st_gid)
+    except OSError:
+        pass
+    os.unlink(file_path)
+    return gz_path
+
+
+def _error_message(error: subprocess.CalledProcessError) -> str:
+    """Describe a failed command by its stderr, decoded only on this error path."""
+    stderr = error.stderr
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode('utf-8', 'replace')
+    return stderr.strip() if stderr else str(error)
+
+
+def _process_file(file_path: str, operation_mode: str, compressor: str, compresslevel: Optional[int] = None) -> tuple:
+    """
+    Process a single file based on the operation mode.
+    
+    Defined at module level so it can be shipped to worker processes.
+    """
+    try:
+        if operation_mode == "gzip" and compressor == "zlib":
+            # Compress in-process: no fork/exec per file
+            compress_file_inprocess(file_path, 6 if compresslevel is None else compresslevel)
+            return (file_path, True, None)
+        
+        if operation_mode == "gzip" and compressor == "isal":
+            # Same as zlib, but DEFLATE and CRC32 run on ISA-L's SIMD kernels
+            from isal import igzip
+            level = ISAL_COMPRESSLEVEL if compresslevel is None else _isal_level(compresslevel)
+            compress_file_inprocess(file_path, level, igzip)
+            return (file_path, True, None)
+        
+        # Generate command based on mode
+        command = generate_command(file_path, operation_mode)
+        if not command:
+            return (file_path, False, "Invalid operation mode")
+        
+        # Split command if it contains multiple operations (e.g., samtools with &&)
+        if ' && ' in command:
+            # Execute multiple commands sequentially
+            for cmd_part in command.split(' && '):
+                # Use shell=True for commands with quotes and special characters
+                subprocess.run(
+                    cmd_part.strip(),
+                    shell=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    check=True
+                )
+        else:
+            # Execute single command
+            # Use shell=True for commands with quotes and special characters.
+            # Only stderr is captured: it's the one stream we report on failure
+            subprocess.run(
+                command,
+                shell=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=True
+            )
+        
+        return (file_path, True, None)
+        
+    except subprocess.CalledProcessError as e:
+        return (file_path, False, _error_message(e))
+    except Exception as e:
+        return (file_path, False, str(e))
+
+
+def _compress_batch(command: List[str], file_paths: List[str]) -> List[tuple]:
+    """
+    Compress several files with a single gzip or pigz invocation.
+    
+    Both tools carry on past files they can't compress, so on a non-zero exit
+    each file's outcome is read back from the filesystem: it succeeded if the
+    original is gone and the .gz exists.
+    """
+    try:
+        subprocess.run(
+            command + file_paths,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        return [(file_path, True, None) for file_path in file_paths]
+    except subprocess.CalledProcessError as e:
+        error = _error_message(e)
+    except Exception as e:
+        error = str(e)
+    
+    results = []
+    for file_path in file_paths:
+        if not os.path.exists(file_path) and os.path.exists(f"{file_path}.gz"):
+            results.append((file_path, True, None))
+        else:
+            results.append((file_path, False, error))
+    return results
+
+
+def _process_batch(file_paths: List[str], operation_mode: str, compressor: str, pigz_threads: int, compresslevel: Optional[int] = None) -> List[tuple]:
+    """
+    Process a batch of files, returning one (path, success, error) per file.
+    
+    Defined at module level so it can be shipped to worker processes. It
+    takes only plain values, so each submit pickles little beyond the paths.
+    """
+    level_args = [] if compresslevel is None else [f"-{compresslevel}"]
+    
+    if operation_mode == "gzip" and compressor == "pigz":
+        # One pigz exec per batch; pigz parallelizes DEFLATE blocks across cores
+        return _compress_batch(['pigz', '-p', str(pigz_threads)] + level_args, file_paths)
+    
+    if operation_mode == "gzip" and compressor == "gzip":
+        # One gzip exec per batch instead of a shell and gzip per file
+        return _compress_batch(['gzip'] + level_args, file_paths)
+    
+    return [_process_file(file_path, operation_mode, compressor, compresslevel) for file_path in file_paths]
 
 
-def execute_gzip_local(files: List[str], num_threads: int = 1, operation_mode: str = "gzip", mode_args = None) -> dict:
+def execute_gzip_local(files: List[str], num_threads: int = 1, operation_mode: str = "gzip", mode_args = None, compressor: str = "gzip", existing_gz: Optional[Set[str]] = None, compresslevel: Optional[int] = None) -> dict:
     """
-    Execute file operations locally using threading.
+    Execute file operations locally using a pool of workers.
     
     Args:
         files: List of file paths to process
-        num_threads: Number of threads to use (0 for auto-detect)
+        num_threads: Number of workers to use (0 for auto-detect)
         operation_mode: Operation mode ("gzip", "gunzip", "sam_to_bam", "bam_to_sam")
-        mode_args: Additional arguments for the mode (optional)
+        mode_args: Additional arguments for the mode (optional; not sent
+            to the workers, which need only the paths and settings below)
+        compressor: Backend for gzip mode ("zlib", "isal", "gzip" or "pigz")
+        existing_gz: Paths of .gz files already known to exist (optional)
+        compresslevel: Compression level 1-9 for gzip mode (default: backend default)
         
     Returns:
         Dictionary with execution results
     """
     if num_threads == 0:
-        # Auto-detect based on available cores (but cap at 8 for I/O operations)
+        # Auto-detect based on available cores. In-process DEFLATE is CPU-bound
+        # and scales with cores; subprocess backends are capped at 8
         import multiprocessing
-        num_threads = min(multiprocessing.cpu_count(), 8)
+        num_threads = multiprocessing.cpu_count()
+        if not (operation_mode == "gzip" and compressor in ("zlib", "isal")):
+            num_threads = min(num_threads, 8)
     
     if num_threads < 1:
         num_threads = 1
     
+    if operation_mode == "gzip" and compressor == "pigz" and shutil.which('pigz') is None:
+        print_status("pigz not found in PATH, falling back to gzip", "[WARN]")
+        compressor = "gzip"
+    
+    if operation_mode == "gzip" and compressor == "isal" and importlib.util.find_spec('isal') is None:
+        print_status("isal package not installed, falling back to zlib", "[WARN]")
+        compressor = "zlib"
+    
+    # pigz threads itself, so run fewer batches at once with several threads
+    # each, and hand each pigz a batch of files to amortize its fork/exec
+    pigz_threads = 1
+    num_workers = num_threads
+    batch_size = 1
+    if operation_mode == "gzip" and compressor == "pigz":
+        pigz_threads = min(4, num_threads)
+        num_workers = max(1, num_threads // pigz_threads)
+        batch_size = EXEC_BATCH_SIZE
+    
     mode_description = get_mode_description(operation_mode)
     print_status(f"Starting local {mode_description.lower()} execution with {num_threads} threads")
     
     # Filter out files that should be skipped based on mode
-    processable_files = [f for f in files if not should_skip_file(f, operation_mode)]
+    processable_files = filter_processable_files(files, operation_mode, existing_gz)
     skipped_count = len(files) - len(processable_files)
     
+    if operation_mode == "gzip" and compressor in ("gzip", "zlib", "isal"):
+        # Single-threaded batches (one gzip exec, or one worker process task
+        # for the in-process backends): small enough that every worker gets
+        # several, so one slow batch doesn't leave the others idle
+        batch_size = max(1, min(EXEC_BATCH_SIZE, len(processable_files) // (num_workers * 4)))
+    
     if skipped_count > 0:
         print_status(f"Skipped {skipped_count} files that don't need processing", "[WARN]")
     
@@ -204,82 +643,43 @@ def execute_gzip_local(files: List[str], num_threads: int = 1, operation_mode: s
         'error_files': []
     }
     
-    # Thread-safe counter for progress
-    completed_lock = threading.Lock()
-    completed_count = 0
+    # In-process DEFLATE is CPU-bound, so use processes to get past the GIL;
+    # subprocess-based backends only wait on children, so threads suffice
+    if operation_mode == "gzip" and compressor in ("zlib", "isal"):
+        executor_class = ProcessPoolExecutor
+    else:
+        executor_class = ThreadPoolExecutor
     
-    def process_file(file_path: str) -> tuple:
-        """Process a single file based on the operation mode."""
-        nonlocal completed_count
-        
-        try:
-            # Generate command based on mode
-            command = generate_command(file_path, operation_mode, mode_args)
-            if not command:
-                return (file_path, False, "Invalid operation mode")
-            
-            # Split command if it contains multiple operations (e.g., samtools with &&)
-            if ' && ' in command:
-                # Execute multiple commands sequentially
-                for cmd_part in command.split(' && '):
-                    # Use shell=True for commands with quotes and special characters
-                    result = subprocess.run(
-                        cmd_part.strip(),
-                        shell=True,
-                        capture_output=True,
-                        text=True,
-                        check=True
-                    )
-            else:
-                # Execute single command
-                # Use shell=True for commands with quotes and special characters
-                result = subprocess.run(
-                    command,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-            
-            # Update progress
-            with completed_lock:
-                completed_count += 1
-                print_progress(completed_count, len(processable_files), f"Processing files")
-            
-            return (file_path, True, None)
-            
-        except subprocess.CalledProcessError as e:
-            # Update progress
-            with completed_lock:
-                completed_count += 1
-                print_progress(completed_count, len(processable_files), f"Processing files")
-            
-            return (file_path, False, str(e))
-        except Exception as e:
-            # Update progress
-            with completed_lock:
-                completed_count += 1
-                print_progress(completed_count, len(processable_files), f"Processing files")
-            
-            return (file_path, False, str(e))
+    completed_count = 0
+    last_update = 0.0
     
-    # Execute processing using thread pool
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+    # Execute processing using the worker pool
+    with executor_class(max_workers=num_workers) as executor:
         # Submit all tasks
-        future_to_file = {
-            executor.submit(process_file, file_path): file_path 
-            for file_path in processable_files
-        }
+        batches = [processable_files[i:i + batch_size] for i in range(0, len(processable_files), batch_size)]
+        # Workers return the paths with their results, so no future-to-batch
+        # mapping is needed
+        futures = [
+            executor.submit(_process_batch, batch, operation_mode, compressor, pigz_threads, compresslevel)
+            for batch in batches
+        ]
         
         # Process completed tasks
-        for future in as_completed(future_to_file):
-            file_path, success, error = future.result()
+        for future in as_completed(futures):
+            for file_path, success, error in future.result():
+                if success:
+                    results['processed'] += 1
+                else:
+                    results['errors'] += 1
+                    results['error_files'].append((file_path, error))
+                
+                completed_count += 1
             
-            if success:
-                results['processed'] += 1
-            else:
-                results['errors'] += 1
-                results['error_files'].append((file_path, error))
+            # Update progress, throttled so terminal I/O doesn't dominate
+            now = time.monotonic()
+            if now - last_update >= PROGRESS_INTERVAL or completed_count == len(processable_files):
+                print_progress(completed_count, len(processable_files), f"Processing files")
+                last_update = now
     
     print()  # Clear progress bar
     
@@ -313,7 +713,7 @@ def should_skip_file(file_path: str, operation_mode: str) -> bool:
     """Determine if a file should be skipped based on the operation mode."""
     if operation_mode == "gzip":
         # Skip if file is already compressed
-        return file_path.endswith('.gz')
+        return file_path.endswith(GZIP_SUFFIXES)
     elif operation_mode == "gunzip":
         # Skip if file is not compressed
         return not file_path.endswith('.gz')
@@ -326,25 +726,84 @@ def should_skip_file(file_path: str, operation_mode: str) -> bool:
     return False
 
 
-def generate_command(file_path: str, operation_mode: str, mode_args=None) -> str:
+def _existing_gz_counterparts(files: List[str]) -> Set[str]:
+    """
+    Return the subset of files whose '<file>.gz' counterpart already exists.
+    
+    Each parent directory is listed once with os.scandir instead of issuing a
+    stat() per file, which matters on cold caches and network filesystems.
+    """
+    by_dir = {}
+    for file_path in files:
+        by_dir.setdefault(os.path.dirname(file_path), []).append(file_path)
+    
+    existing = set()
+    for dir_path, dir_files in by_dir.items():
+        try:
+            with os.scandir(dir_path or '.') as it:
+                gz_names = {entry.name for entry in it if entry.name.endswith('.gz')}
+        except OSError:
+            continue
+        existing.update(f for f in dir_files if f"{os.path.basename(f)}.gz" in gz_names)
+    
+    return existing
+
+
+def filter_processable_files(files: List[str], operation_mode: str, existing_gz: Optional[Set[str]] = None) -> List[str]:
+    """
+    Return the files that need processing for the given operation mode.
+    
+    Same result as filtering with should_skip_file, but the mode is resolved
+    once for the whole list. In gzip mode, files whose .gz counterpart already
+    exists are dropped as well, since gzip refuses to overwrite it. If the
+    caller already knows which .gz files exist (existing_gz, as collected by
+    find_files_with_suffixes), that check is a set lookup with no syscalls.
+    """
+    if operation_mode == "gzip":
+        candidates = [f for f in files if not f.endswith(GZIP_SUFFIXES)]
+        if existing_gz is not None:
+            return [f for f in candidates if f"{f}.gz" not in existing_gz]
+        existing = _existing_gz_counterparts(candidates)
+        return [f for f in candidates if f not in existing]
+    elif operation_mode == "gunzip":
+        return [f for f in files if f.endswith('.gz')]
+    elif operation_mode == "sam_to_bam":
+        return [f for f in files if f.endswith('.sam')]
+    elif operation_mode == "bam_to_sam":
+        return [f for f in files if f.endswith('.bam')]
+    return list(files)
+
+
+def _quote(path: str) -> str:
+    """
+    Single-quote a path for the shell.
+    
+    Unlike shlex.quote, plain paths are always quoted, so commands keep the
+    familiar gzip '/path' form; embedded single quotes are closed, escaped
+    and reopened so they can't break out of the quoting.
+    """
+    return "'" + path.replace("'", "'\"'\"'") + "'"
+
+
+def generate_command(file_path: str, operation_mode: str, mode_args=None, gzip_command: str = "gzip") -> str:
     """Generate the appropriate command based on the operation mode."""
     if operation_mode == "gzip":
-        return f"gzip '{file_path}'"
+        return f"{gzip_command} {_quote(file_path)}"
     elif operation_mode == "gunzip":
-        return f"gunzip '{file_path}'"
+        return f"gunzip {_quote(file_path)}"
     elif operation_mode == "sam_to_bam":
         # Generate output filename
         fps = file_path.split('.')
         file_path_prefix, suffix = '.'.join(fps[:-1]), fps[-1]
         assert suffix == 'sam'
         output_file = f"{file_path_prefix}.bam"
-        return f"samtools view -bS -o '{output_file}' '{file_path}'"
+        return f"samtools view -bS -o {_quote(output_file)} {_quote(file_path)}"
     elif operation_mode == "bam_to_sam":
         # Generate output filename
         fps = file_path.split('.')
         file_path_prefix, suffix = '.'.join(fps[:-1]), fps[-1]
         assert suffix == 'bam'
         output_file = f"{file_path_prefix}.sam"
-        return f"samtools view -h -o '{output_file}' '{file_path}'"
+        return f"samtools view -h -o {_quote(output_file)} {_quote(file_path)}"
     
     return None
@@ -7,11 +7,11 @@ a task file for gzip compression operations. It can also auto-run on Slurm using
 """
 
 import argparse
+import functools
 import os
 import sys
 from pathlib import Path
 from typing import List, Set
-from rich_argparse import RichHelpFormatter
 
 from .utils import (
     print_header,
@@ -25,13 +25,45 @@ from .slurm_operations import generate_slurm_script
 from . import __version__
 
 
-class CustomRichHelpFormatter(RichHelpFormatter):
-    """Custom formatter that combines rich-argparse with proper width handling."""
+# Suffixes of files that are already compressed or archived
+_COMPRESSION_FORMATS = frozenset({'.gz', '.bz2', '.xz', '.zip', '.tar', '.7z', '.rar'})
+
+# Mode flags in order of precedence, and the fixed suffixes each mode scans
+# for (gzip mode, the default, uses the suffixes given with -s)
+_MODE_FLAGS = ("gunzip", "sam_to_bam", "bam_to_sam")
+_MODE_SUFFIXES = {
+    "gunzip": frozenset({".gz"}),
+    "sam_to_bam": frozenset({".sam"}),
+    "bam_to_sam": frozenset({".bam"}),
+}
+
+# Slurm options handed to generate_slurm_script. Order matters: --mem is
+# divided by cpus_per_task, and an explicit --mem-per-cpu overrides --mem
+_SLURM_FIELDS = (
+    "partition", "nodes", "ntasks", "cpus_per_task", "mem", "mem_per_cpu",
+    "time", "output_log", "error_log",
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_formatter_class():
+    """
+    Build the help formatter class on first use.
+    
+    rich-argparse pulls in rich and its whole styling stack, so it is only
+    imported once a parser is created, not whenever gzip_up is imported.
+    """
+    from rich_argparse import RichHelpFormatter
+    
+    class CustomRichHelpFormatter(RichHelpFormatter):
+        """Custom formatter that combines rich-argparse with proper width handling."""
+        
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.width = 80
+            self.max_help_position = 30
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.width = 80
-        self.max_help_position = 30
+    return CustomRichHelpFormatter
 
 
 def print_logo():
@@ -87,43 +119,44 @@ def validate_suffixes(suffixes: List[str]) -> Set[str]:
     Raises:
         ValueError: If any suffix is invalid
     """
-    normalized_suffixes = set()
+    # Normalize suffixes to start with dot
+    normalized_suffixes = {suffix if suffix.startswith('.') else '.' + suffix for suffix in suffixes}
     
-    for suffix in suffixes:
-        # Normalize suffix to start with dot
-        if not suffix.startswith('.'):
-            normalized_suffix = f'.{suffix}'
-        else:
-            normalized_suffix = suffix
-        
-        # Reject .gz suffixes
-        if normalized_suffix == '.gz':
-                    raise ValueError(
-            f"[ERROR] Invalid suffix '{suffix}': Cannot compress already compressed .gz files"
+    # Reject .gz suffixes
+    if '.gz' in normalized_suffixes:
+        raise ValueError(
+            "[ERROR] Invalid suffix '.gz': Cannot compress already compressed .gz files"
         )
-        
-        # Reject other compression formats
-        compression_formats = {'.gz', '.bz2', '.xz', '.zip', '.tar', '.7z', '.rar'}
-        if normalized_suffix in compression_formats:
-                    raise ValueError(
-            f"[ERROR] Invalid suffix '{suffix}': File appears to already be compressed"
+    
+    # Reject other compression formats, naming every offending suffix at once
+    compressed = normalized_suffixes & _COMPRESSION_FORMATS
+    if compressed:
+        names = ", ".join(f"'{suffix}'" for suffix in sorted(compressed))
+        raise ValueError(
+            f"[ERROR] Invalid suffix {names}: File appears to already be compressed"
         )
-        
-        normalized_suffixes.add(normalized_suffix)
     
     return normalized_suffixes
 
 
+@functools.lru_cache(maxsize=1)
 def create_colored_parser():
-    """Create a colorful and enhanced argument parser."""
+    """
+    Create a colorful and enhanced argument parser.
+    
+    The parser is built once and shared: parse_args() doesn't modify it, so
+    repeated calls (e.g. main() in tests) reuse the same instance. Callers
+    must not add arguments or change defaults on the returned parser.
+    """
+    formatter_class = _get_formatter_class()
     parser = argparse.ArgumentParser(
         description="Generate (de)compression command/task list file and optionally a Slurm script.",
-        formatter_class=CustomRichHelpFormatter,
+        formatter_class=formatter_class,
         add_help=True
     )
     
     # Configure rich-argparse for better coloring
-    parser.formatter_class = CustomRichHelpFormatter
+    parser.formatter_class = formatter_class
     parser.formatter_class.rich_theme = "dracula"
     parser.formatter_class.rich_console_options = {"force_terminal": True, "color_system": "auto"}
     parser.formatter_class.rich_show_help = True
@@ -152,6 +185,13 @@ def create_colored_parser():
         help='Output task file name (default: gzip.cmds)',
         metavar='FILE'
     )
+    file_group.add_argument(
+        '--scan-threads',
+        type=int,
+        default=8,
+        help='Number of directories to scan concurrently; helps most on network filesystems (default: 8). Files are found in no fixed order; task files are still reproducible because commands are sorted by size, then path',
+        metavar='N'
+    )
     
     # Modes
     modes_group = parser.add_argument_group(
@@ -208,6 +248,19 @@ def create_colored_parser():
         action='store_true',
         help='Run gzip operations locally using threading (instead of just generating task file)'
     )
+    local_group.add_argument(
+        '--compressor',
+        choices=['zlib', 'isal', 'gzip', 'pigz'],
+        default='gzip',
+        help='Compression backend for --local-run: in-process zlib using worker processes, in-process ISA-L (requires the isal package), the gzip binary, or multithreaded pigz (default: gzip). With pigz, task file lines also use pigz -p <--cpus-per-task>, or the CPU count Slurm gives each task when that is not given'
+    )
+    local_group.add_argument(
+        '--level',
+        type=int,
+        choices=range(1, 10),
+        help='Compression level for --local-run, from 1 (fastest) to 9 (smallest) (default: 6). isal has levels 0-3, so 1-3 map to 0, 4-5 to 1, 6-7 to 2 and 8-9 to 3',
+        metavar='N'
+    )
     
     # Slurm-specific arguments
     slurm_params_group = parser.add_argument_group(
@@ -231,6 +284,7 @@ def create_colored_parser():
     )
     slurm_params_group.add_argument(
         '--cpus-per-task', 
+        type=int,
         help='CPUs per task',
         metavar='N'
     )
@@ -323,13 +377,7 @@ Tips:
         sys.exit(0)
     
     # Determine operation mode
-    operation_mode = "gzip"
-    if args.gunzip:
-        operation_mode = "gunzip"
-    elif args.sam_to_bam:
-        operation_mode = "sam_to_bam"
-    elif args.bam_to_sam:
-        operation_mode = "bam_to_sam"
+    operation_mode = next((mode for mode in _MODE_FLAGS if getattr(args, mode)), "gzip")
     
 
     
@@ -344,13 +392,17 @@ Tips:
         print_status(f"[ERROR] Directory '{args.directory}' does not exist.", "[ERROR]")
         sys.exit(1)
     
+    if args.scan_threads < 1:
+        print_status(f"[ERROR] --scan-threads must be at least 1, got {args.scan_threads}.", "[ERROR]")
+        sys.exit(1)
+    
+    if args.cpus_per_task is not None and args.cpus_per_task < 1:
+        print_status(f"[ERROR] --cpus-per-task must be at least 1, got {args.cpus_per_task}.", "[ERROR]")
+        sys.exit(1)
+    
     # Determine suffixes based on mode
-    if operation_mode == "gunzip":
-        suffixes = {".gz"}
-    elif operation_mode == "sam_to_bam":
-        suffixes = {".sam"}
-    elif operation_mode == "bam_to_sam":
-        suffixes = {".bam"}
+    if operation_mode in _MODE_SUFFIXES:
+        suffixes = _MODE_SUFFIXES[operation_mode]
     else:
         # Validate and normalize user-provided suffixes
         try:
@@ -361,43 +413,48 @@ Tips:
     
     print_header(f"[*] Gzip-up Task Generator - {operation_mode.upper()} Mode")
     
-    # Find matching files
-    files = find_files_with_suffixes(args.directory, suffixes)
+    # Find matching files, noting existing .gz files for the skip checks and
+    # the size of each match for the summary and task ordering
+    existing_gz = set()
+    file_sizes = {}
+    files = find_files_with_suffixes(args.directory, suffixes, existing_gz, scan_threads=args.scan_threads, file_sizes=file_sizes)
     
     if not files:
         print_status("[WARN]  No files found with the specified suffixes.", "[WARN]")
         sys.exit(0)
     
     # Display file summary
-    display_file_summary(files)
+    display_file_summary(files, file_sizes)
     
     # Generate task file
     print_section("[*] Task File Generation")
     
-    # Check if chunking is needed based on max-jobs
-    use_chunking = False
-    max_jobs_for_chunking = None
+    # With --compressor pigz, task lines use pigz sized to each task's CPUs:
+    # --cpus-per-task if given, otherwise whatever Slurm allocated to the
+    # array task, and a single thread when run outside Slurm (e.g. parallel)
+    gzip_command = "gzip"
+    if args.compressor == "pigz":
+        if args.cpus_per_task is not None:
+            gzip_command = f"pigz -p {args.cpus_per_task}"
+        else:
+            gzip_command = 'pigz -p "${SLURM_CPUS_PER_TASK:-1}"'
     
-    if args.max_jobs and len(files) > args.max_jobs:
-        use_chunking = True
-        max_jobs_for_chunking = args.max_jobs
-        print_status(f"Using chunked approach to respect --max-jobs limit of {args.max_jobs}", "[INFO]")
-    else:
-        print_status("Using standard approach (no chunking)", "[INFO]")
+    # Generate task file, chunked if needed
+    task_file_path, command_count, is_chunked = generate_task_file(files, args.output, args.max_jobs, operation_mode, args, existing_gz, gzip_command, file_sizes)
     
-    # Generate task file with or without chunking
-    if use_chunking:
-        task_file_path = generate_task_file(files, args.output, max_jobs_for_chunking, operation_mode, args)
+    # generate_task_file decides on chunking, since only it knows how many
+    # files actually need processing
+    if is_chunked:
+        print_status(f"Used chunked approach to respect --max-jobs limit of {args.max_jobs}", "[INFO]")
     else:
-        task_file_path = generate_task_file(files, args.output, operation_mode=operation_mode, mode_args=args)
-    
-    print_status(f"Task file generated: {task_file_path}", "[OK]")
+        print_status("Used standard approach (no chunking)", "[INFO]")
+    print_status(f"Task file generated: {task_file_path} ({command_count} task lines)", "[OK]")
     
     # Execute locally if requested
     if args.local_run:
         print_section("[*] Local Threading Execution")
         from .file_operations import execute_gzip_local
-        results = execute_gzip_local(files, args.threads, operation_mode, args)
+        results = execute_gzip_local(files, args.threads, operation_mode, args, args.compressor, existing_gz, args.level)
         
         if results['errors'] > 0:
             print_status(f"Local execution completed with {results['errors']} errors", "[WARN]")
@@ -407,21 +464,11 @@ Tips:
     # Generate Slurm script if requested
     if args.slurm:
         print_section("[*] Slurm Script Generation")
-        slurm_args = {
-            'partition': args.partition,
-            'nodes': args.nodes,
-            'ntasks': args.ntasks,
-            'cpus_per_task': args.cpus_per_task,
-            'mem': args.mem,
-            'time': args.time,
-            'output': args.output_log,
-            'error': args.error_log
-        }
-        
-        # Remove None values
-        slurm_args = {k: v for k, v in slurm_args.items() if v is not None}
+        # Only pass options the user set; generate_slurm_script fills in the rest
+        slurm_args = {field: getattr(args, field) for field in _SLURM_FIELDS if getattr(args, field) is not None}
         
-        script_path = generate_slurm_script(files, slurm_args, operation_mode)
+        script_path = generate_slurm_script(files, slurm_args, operation_mode,
+                                            task_file_path, command_count, is_chunked)
         
         print_section("[*] Ready for Manual Execution")
         print_status(f"Task file: {task_file_path}", "[*]")
@@ -448,7 +495,7 @@ Tips:
             print(f"  # Using threading: gzip-up --bam-to-sam --local-run --threads 4")
         
         print(f"  # Using parallel: parallel < {task_file_path}")
-        print(f"  # Using xargs: xargs -P $(nproc) -a {task_file_path}")
+        print(f"  # Using xargs (64 commands per shell): grep -v '^#' {task_file_path} | xargs -d '\\n' -n 64 -P $(nproc) sh -c 'for cmd; do eval \"$cmd\"; done' sh")
         print(f"  # Or run each command individually")
     
     print_header("[*] Task Complete!")
@@ -3,14 +3,60 @@ Slurm operations for generating batch scripts and submitting jobs.
 """
 
 import os
+import re
+import select
 import subprocess
-import time
-import threading
-from typing import List, Dict
+from typing import List, Dict, Optional
+from .file_operations import GZIP_SUFFIXES, _quote
 from .utils import print_status
 
 
-def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operation_mode: str = "gzip") -> str:
+# Total memory given with --mem, e.g. "8G", "16GB" or "4096M"
+_MEM_RE = re.compile(r'^(\d+)([GM])B?$', re.IGNORECASE)
+
+
+# Body of the job array script, filled in by generate_slurm_script
+SLURM_SCRIPT_TEMPLATE = """#!/bin/bash
+#SBATCH --job-name={job_name}
+#SBATCH --ntasks={ntasks}
+#SBATCH --cpus-per-task={cpus_per_task}
+#SBATCH --mem-per-cpu={mem_per_cpu}
+#SBATCH --array=1-{array_size}
+#SBATCH --partition={partition}
+#SBATCH --time={time}
+#SBATCH --output={output}
+#SBATCH --error={error}
+
+# Load any required modules
+# module load your_module
+
+echo "Starting {mode_description} job"
+echo "Job ID: $SLURM_JOB_ID"
+echo "Array Job ID: $SLURM_ARRAY_JOB_ID"
+echo "Array Task ID: $SLURM_ARRAY_TASK_ID"
+echo "Number of CPUs: $SLURM_CPUS_PER_TASK"
+echo "Memory per CPU: $SLURM_MEM_PER_CPU"
+
+# Specify the path to the task file
+task_file={task_file}
+
+# Extract the individual command for this array task
+# (array task N runs the Nth command line; header comments and blank lines are not counted)
+task_cmd=$(awk -v SID=$SLURM_ARRAY_TASK_ID '!/^#/ && NF && ++n == SID {{print; exit}}' "$task_file")
+
+echo "Executing: $task_cmd"
+echo "Task $SLURM_ARRAY_TASK_ID of $SLURM_ARRAY_TASK_COUNT"
+
+# Execute the {mode_description} command
+eval "$task_cmd"
+
+echo "{mode_description} task $SLURM_ARRAY_TASK_ID completed"
+"""
+
+
+def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operation_mode: str = "gzip",
+                          task_file: str = "gzip.cmds", array_size: Optional[int] = None,
+                          is_chunked: Optional[bool] = None) -> str:
     """
     Generate a Slurm batch script for file operations using job arrays.
     
@@ -18,6 +64,11 @@ def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operatio
         files: List of file paths to process
         slurm_args: Dictionary of Slurm parameters
         operation_mode: Operation mode ("gzip", "gunzip", "sam_to_bam", "bam_to_sam")
+        task_file: Path to the task file the array tasks read (default: gzip.cmds)
+        array_size: Number of task lines, as returned by generate_task_file
+            (optional; counted from files when not given)
+        is_chunked: Whether task lines hold several commands, as returned by
+            generate_task_file (optional; detected from task_file when not given)
         
     Returns:
         Path to the generated Slurm script
@@ -51,12 +102,18 @@ def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operatio
             # Map user keys to Slurm parameter names
             if key == 'mem':
                 # Convert total memory to per-CPU memory
-                if 'G' in value.upper():
-                    mem_gb = float(value.upper().replace('G', ''))
-                    defaults['mem_per_cpu'] = f"{max(1, mem_gb // int(defaults['cpus_per_task']))}G"
-                elif 'M' in value.upper():
-                    mem_mb = float(value.upper().replace('M', ''))
-                    defaults['mem_per_cpu'] = f"{max(1024, mem_mb // int(defaults['cpus_per_task']))}M"
+                match = _MEM_RE.match(value)
+                if not match:
+                    print_status(f"Ignoring --mem '{value}': expected a whole number of G or M, e.g. 16GB", "[WARN]")
+                    continue
+                # Split in megabytes so uneven splits aren't rounded down to
+                # whole gigabytes, and report whole gigabytes as G
+                total_mb = int(match.group(1)) * (1024 if match.group(2).upper() == 'G' else 1)
+                per_cpu_mb = max(1, total_mb // int(defaults['cpus_per_task']))
+                if per_cpu_mb % 1024 == 0:
+                    defaults['mem_per_cpu'] = f"{per_cpu_mb // 1024}G"
+                else:
+                    defaults['mem_per_cpu'] = f"{per_cpu_mb}M"
             elif key == 'output_log':
                 defaults['output'] = value
             elif key == 'error_log':
@@ -65,42 +122,43 @@ def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operatio
                 # Direct mapping for other parameters
                 defaults[key] = value
     
-    # Count processable files for array size based on operation mode
-    if operation_mode == "gzip":
-        processable_files = [f for f in files if not f.endswith('.gz')]
-        mode_description = "gzip compression"
-    elif operation_mode == "gunzip":
-        processable_files = [f for f in files if f.endswith('.gz')]
-        mode_description = "gunzip decompression"
-    elif operation_mode == "sam_to_bam":
-        processable_files = [f for f in files if f.endswith('.sam')]
-        mode_description = "SAM to BAM conversion"
-    elif operation_mode == "bam_to_sam":
-        processable_files = [f for f in files if f.endswith('.bam')]
-        mode_description = "BAM to SAM conversion"
-    else:
-        processable_files = [f for f in files if not f.endswith('.gz')]
-        mode_description = "file processing"
+    mode_descriptions = {
+        "gzip": "gzip compression",
+        "gunzip": "gunzip decompression",
+        "sam_to_bam": "SAM to BAM conversion",
+        "bam_to_sam": "BAM to SAM conversion"
+    }
+    mode_description = mode_descriptions.get(operation_mode, "file processing")
     
-    array_size = len(processable_files)
+    # Count processable files for array size based on operation mode, unless
+    # the caller already knows how many lines the task file has
+    if array_size is None:
+        if operation_mode == "gunzip":
+            array_size = sum(1 for f in files if f.endswith('.gz'))
+        elif operation_mode == "sam_to_bam":
+            array_size = sum(1 for f in files if f.endswith('.sam'))
+        elif operation_mode == "bam_to_sam":
+            array_size = sum(1 for f in files if f.endswith('.bam'))
+        else:
+            array_size = sum(1 for f in files if not f.endswith(GZIP_SUFFIXES))
     
     if array_size == 0:
         print_status(f"No files found for {mode_description} in Slurm script", "[WARN]")
         return ""
     
-    # Get the task file name from the output parameter or use default
-    task_file_name = slurm_args.get('output', 'gzip.cmds')
-    
-    # Check if this is a chunked file (contains semicolons)
-    is_chunked = False
-    try:
-        with open(task_file_name, 'r') as f:
-            for line in f:
-                if line.strip() and ';' in line.strip():
-                    is_chunked = True
-                    break
-    except Exception:
-        pass
+    # Check if this is a chunked file, unless the caller already knows. Every
+    # command line has the same shape, so only the first one after the header
+    # needs reading: chunked lines join their commands with semicolons.
+    if is_chunked is None:
+        is_chunked = False
+        try:
+            with open(task_file, 'rb') as f:
+                for line in f:
+                    if line.strip() and not line.startswith(b'#'):
+                        is_chunked = b';' in line
+                        break
+        except Exception:
+            pass
     
     if is_chunked:
         print_status("Chunked execution detected - task file contains multiple commands per line", "[INFO]")
@@ -108,41 +166,15 @@ def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operatio
     else:
         print_status(f"Standard execution - each SLURM array task processes one file for {mode_description}", "[INFO]")
     
+    script_body = SLURM_SCRIPT_TEMPLATE.format(
+        **defaults,
+        array_size=array_size,
+        # Quoted like task lines, so any path survives the shell
+        task_file=_quote(task_file),
+        mode_description=mode_description
+    )
     with open(script_path, 'w') as f:
-        f.write("#!/bin/bash\n")
-        f.write(f"#SBATCH --job-name={defaults['job_name']}\n")
-        f.write(f"#SBATCH --ntasks={defaults['ntasks']}\n")
-        f.write(f"#SBATCH --cpus-per-task={defaults['cpus_per_task']}\n")
-        f.write(f"#SBATCH --mem-per-cpu={defaults['mem_per_cpu']}\n")
-        f.write(f"#SBATCH --array=1-{array_size}\n")
-        f.write(f"#SBATCH --partition={defaults['partition']}\n")
-        f.write(f"#SBATCH --time={defaults['time']}\n")
-        f.write(f"#SBATCH --output={defaults['output']}\n")
-        f.write(f"#SBATCH --error={defaults['error']}\n")
-        
-        f.write("\n# Load any required modules\n")
-        f.write("# module load your_module\n\n")
-        
-        f.write(f"echo \"Starting {mode_description} job\"\n")
-        f.write("echo \"Job ID: $SLURM_JOB_ID\"\n")
-        f.write("echo \"Array Job ID: $SLURM_ARRAY_JOB_ID\"\n")
-        f.write("echo \"Array Task ID: $SLURM_ARRAY_TASK_ID\"\n")
-        f.write("echo \"Number of CPUs: $SLURM_CPUS_PER_TASK\"\n")
-        f.write("echo \"Memory per CPU: $SLURM_MEM_PER_CPU\"\n\n")
-        
-        f.write("# Specify the path to the task file\n")
-        f.write(f"task_file=\"{task_file_name}\"\n\n")
-        
-        f.write("# Extract the individual command for this array task\n")
-        f.write("task_cmd=$(awk -v SID=$SLURM_ARRAY_TASK_ID 'NR==SID {print; exit}' $task_file)\n\n")
-        
-        f.write("echo \"Executing: $task_cmd\"\n")
-        f.write("echo \"Task $SLURM_ARRAY_TASK_ID of $SLURM_ARRAY_TASK_COUNT\"\n\n")
-        
-        f.write(f"# Execute the {mode_description} command\n")
-        f.write("eval $task_cmd\n\n")
-        
-        f.write(f"echo \"{mode_description} task $SLURM_ARRAY_TASK_ID completed\"\n")
+        f.write(script_body)
     
     # Make script executable
     os.chmod(script_path, 0o755)
@@ -153,6 +185,37 @@ def generate_slurm_script(files: List[str], slurm_args: Dict[str, str], operatio
     return script_path
 
 
+def _report_job_states(squeue_process: subprocess.Popen, pending: bytes, job_states: Dict[str, str]) -> bytes:
+    """
+    Print job state changes from whatever squeue output is ready, without blocking.
+    
+    Lines are "jobid|state"; squeue also prints a timestamp line per
+    iteration, which has no separator and is ignored. job_states holds the
+    last state seen per job, so unchanged states aren't printed again.
+    
+    Returns:
+        Trailing partial line, to be passed back in on the next call
+    """
+    fd = squeue_process.stdout.fileno()
+    try:
+        while select.select([fd], [], [], 0)[0]:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            pending += chunk
+    except OSError as e:
+        print_status(f"Error monitoring job: {e}", "[WARN]")
+    
+    *lines, pending = pending.split(b'\n')
+    for line in lines:
+        job_id, sep, status = line.decode(errors='replace').strip().partition('|')
+        if not sep or job_states.get(job_id) == status:
+            continue
+        job_states[job_id] = status
+        print_status(f"Job {job_id} status: {status}", "[INFO]")
+    return pending
+
+
 def run_on_slurm(script_path: str) -> bool:
     """
     Execute the Slurm script using srun and monitor progress until completion.
@@ -172,44 +235,36 @@ def run_on_slurm(script_path: str) -> bool:
         # Start srun process
         srun_process = subprocess.Popen(srun_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
         
-        # Monitor progress with squeue every 10 seconds
-        def monitor_progress():
-            """Monitor job progress using squeue every 10 seconds."""
-            while srun_process.poll() is None:  # While process is still running
+        # Monitor progress with one long-lived squeue that re-polls every 10
+        # seconds itself (--iterate), instead of forking squeue per poll
+        squeue_cmd = ['squeue', '--user', os.getenv('USER', ''), '--name', 'gzip-up_compression',
+                      '--noheader', '--iterate', '10', '--format=%i|%T']
+        try:
+            squeue_process = subprocess.Popen(squeue_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            print_status(f"Error monitoring job: {e}", "[WARN]")
+            squeue_process = None
+        
+        # Wait for srun to complete, reporting squeue output every 10 seconds
+        # from this thread rather than a separate monitor thread
+        job_states = {}
+        pending = b""
+        try:
+            while True:
                 try:
-                    # Check running jobs with squeue (filter by user and script name)
-                    squeue_result = subprocess.run(['squeue', '--user', os.getenv('USER', ''), '--name', 'gzip-up_compression'], 
-                                                 capture_output=True, text=True, check=True)
-                    
-                    if 'gzip-up_compression' in squeue_result.stdout or 'gzip-up_compression' in squeue_result.stderr:
-                        # Job is still running
-                        lines = squeue_result.stdout.strip().split('\n')
-                        if len(lines) > 1:  # Skip header line
-                            status_line = lines[1]
-                            parts = status_line.split()
-                            if len(parts) >= 5:
-                                status = parts[4]  # Job status column
-                                job_id = parts[0]  # Job ID column
-                                print_status(f"Job {job_id} status: {status}", "[INFO]")
-                    else:
-                        # Job completed or not found
-                        print_status("Job no longer in queue", "[INFO]")
-                        break
-                        
-                except subprocess.CalledProcessError:
-                    # squeue failed, job might be completed
+                    stdout, stderr = srun_process.communicate(timeout=10)
                     break
-                except Exception as e:
-                    print_status(f"Error monitoring job: {e}", "[WARN]")
-                
-                time.sleep(10)  # Wait 10 seconds before next check
-        
-        # Start monitoring in a separate thread
-        monitor_thread = threading.Thread(target=monitor_progress, daemon=True)
-        monitor_thread.start()
-        
-        # Wait for srun to complete
-        stdout, stderr = srun_process.communicate()
+                except subprocess.TimeoutExpired:
+                    if squeue_process is not None:
+                        pending = _report_job_states(squeue_process, pending, job_states)
+        finally:
+            # Also runs on Ctrl-C or an error, so neither child is left behind
+            if srun_process.returncode is None:
+                srun_process.terminate()
+                srun_process.wait()
+            if squeue_process is not None:
+                squeue_process.terminate()
+                squeue_process.wait()
         
         if srun_process.returncode == 0:
             print_status("Job completed successfully!", "[OK]")
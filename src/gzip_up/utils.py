@@ -2,21 +2,27 @@
 Utility functions for visual formatting and display.
 """
 
-from typing import List
-from pathlib import Path
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+_HEADER_BAR = "=" * 60
+_SECTION_BAR = "-" * 40
+
+# File lists at least this long are stat'd on a thread pool
+_PARALLEL_STAT_THRESHOLD = 64
+_STAT_THREADS = min(32, (os.cpu_count() or 1) * 4)
 
 
 def print_header(title: str):
     """Print a formatted header."""
-    print("\n" + "=" * 60)
-    print(f"[*] {title}")
-    print("=" * 60)
+    print(f"\n{_HEADER_BAR}\n[*] {title}\n{_HEADER_BAR}")
 
 
 def print_section(title: str):
     """Print a formatted section header."""
-    print(f"\n[+] {title}")
-    print("-" * 40)
+    print(f"\n[+] {title}\n{_SECTION_BAR}")
 
 
 def print_status(message: str, status: str = "[i]"):
@@ -24,46 +30,84 @@ def print_status(message: str, status: str = "[i]"):
     print(f"{status} {message}")
 
 
+_BAR_LENGTH = 30
+_BAR_FILLED = '█' * _BAR_LENGTH
+_BAR_EMPTY = '░' * _BAR_LENGTH
+
+
 def print_progress(current: int, total: int, prefix: str = "Progress"):
-    """Print a simple progress bar."""
-    bar_length = 30
-    filled_length = int(bar_length * current // total)
-    bar = '█' * filled_length + '░' * (bar_length - filled_length)
-    percentage = current / total * 100
-    print(f"\r{prefix}: [{bar}] {current}/{total} ({percentage:.1f}%)", end='', flush=True)
-    if current == total:
-        print()  # New line when complete
-
-
-def display_file_summary(files: List[str]):
-    """Display a summary of found files with statistics."""
+    """Print a simple progress bar, redrawn only when the shown percentage changes."""
+    if total <= 0:
+        return
+    # The percentage is shown to 0.1%, so a bar has at most 1000 distinct states
+    state = (prefix, total, current * 1000 // total)
+    if state == print_progress.last_state and current != total:
+        return
+    print_progress.last_state = state
+    
+    filled_length = _BAR_LENGTH * current // total
+    bar = _BAR_FILLED[:filled_length] + _BAR_EMPTY[:_BAR_LENGTH - filled_length]
+    # End with a newline once complete
+    print(f"\r{prefix}: [{bar}] {current}/{total} ({current * 100 / total:.1f}%)",
+          end='\n' if current == total else '', flush=True)
+
+
+print_progress.last_state = None
+
+
+def print_counter(current: int, prefix: str = "Progress"):
+    """Print a running count for work whose total is not known in advance."""
+    print(f"\r{prefix}: {current}", end='', flush=True)
+
+
+def _format_size(nbytes: int) -> str:
+    """Format a byte count as KB, MB or GB with two decimals."""
+    size_kb = nbytes / 1024
+    if size_kb < 1024:
+        return f"{size_kb:.2f} KB"
+    size_mb = size_kb / 1024
+    if size_mb > 1024:
+        return f"{size_mb / 1024:.2f} GB"
+    return f"{size_mb:.2f} MB"
+
+
+def _safe_stat_size(file_path: str) -> int:
+    """Return the size of a file, or 0 if it cannot be stat'd."""
+    try:
+        return os.stat(file_path).st_size
+    except OSError:
+        return 0
+
+
+def display_file_summary(files: List[str], file_sizes: Optional[Dict[str, int]] = None):
+    """Display a summary of found files with statistics, using sizes from the scan when given."""
     print_section("File Summary")
     
     # Count by suffix
-    suffix_counts = {}
+    suffix_counts = Counter(os.path.splitext(file_path)[1] for file_path in files)
     total_size = 0
+    unsized = []
     
     for file_path in files:
-        suffix = Path(file_path).suffix
-        suffix_counts[suffix] = suffix_counts.get(suffix, 0) + 1
-        
-        try:
-            total_size += Path(file_path).stat().st_size
-        except OSError:
-            pass
+        if file_sizes is not None and file_path in file_sizes:
+            total_size += file_sizes[file_path]
+        else:
+            unsized.append(file_path)
     
-    # Display suffix breakdown
-    print("[*] Files by type:")
+    # stat releases the GIL, so long lists are sized concurrently
+    if len(unsized) >= _PARALLEL_STAT_THRESHOLD:
+        with ThreadPoolExecutor(max_workers=_STAT_THREADS) as executor:
+            total_size += sum(executor.map(_safe_stat_size, unsized))
+    else:
+        total_size += sum(map(_safe_stat_size, unsized))
+    
+    # Build the suffix breakdown and totals, then write them in one go
+    lines = ["[*] Files by type:"]
     for suffix, count in sorted(suffix_counts.items()):
-        print(f"   {suffix}: {count} files")
+        lines.append(f"   {suffix}: {count} files")
     
-    # Display total size
     if total_size > 0:
-        size_mb = total_size / (1024 * 1024)
-        if size_mb > 1024:
-            size_gb = size_mb / 1024
-            print(f"[*] Total size: {size_gb:.2f} GB")
-        else:
-            print(f"[*] Total size: {size_mb:.2f} MB")
+        lines.append(f"[*] Total size: {_format_size(total_size)}")
     
-    print(f"[*] Total files: {len(files)}")
+    lines.append(f"[*] Total files: {len(files)}")
+    print("\n".join(lines))
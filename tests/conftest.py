@@ -9,6 +9,10 @@ from pathlib import Path
 import os
 
 
+# ~1MB of ASCII content for the large_file fixture, encoded once
+_LARGE_CONTENT = b"This is a test line. " * 50000
+
+
 @pytest.fixture
 def sample_files(tmp_path):
     """Create sample files for testing."""
@@ -34,13 +38,18 @@ def sample_files(tmp_path):
             file_path.write_text(f"Sample content for {filename}")
             created_files.append(str(file_path))
     
+    # Group the created files by extension in one pass
+    by_ext = {ext: [] for ext in files}
+    for file_path in created_files:
+        by_ext[file_path.rsplit('.', 1)[-1]].append(file_path)
+    
     return {
         'files': created_files,
-        'txt_files': [f for f in created_files if f.endswith('.txt')],
-        'log_files': [f for f in created_files if f.endswith('.log')],
-        'csv_files': [f for f in created_files if f.endswith('.csv')],
-        'gz_files': [f for f in created_files if f.endswith('.gz')],
-        'py_files': [f for f in created_files if f.endswith('.py')],
+        'txt_files': by_ext['txt'],
+        'log_files': by_ext['log'],
+        'csv_files': by_ext['csv'],
+        'gz_files': by_ext['gz'],
+        'py_files': by_ext['py'],
         'root_dir': str(tmp_path)
     }
 
@@ -51,8 +60,7 @@ def large_file(tmp_path):
     large_file_path = tmp_path / "large_file.txt"
     
     # Create a file with ~1MB of content
-    content = "This is a test line. " * 50000  # ~1MB
-    large_file_path.write_text(content)
+    large_file_path.write_bytes(_LARGE_CONTENT)
     
     return str(large_file_path)
 
@@ -69,12 +77,15 @@ def empty_directory(tmp_path):
 def nested_directory_structure(tmp_path):
     """Create a nested directory structure for testing."""
     # Create nested structure
-    (tmp_path / "level1" / "level2" / "level3").mkdir(parents=True)
+    level1 = tmp_path / "level1"
+    level2 = level1 / "level2"
+    level3 = level2 / "level3"
+    level3.mkdir(parents=True)
     
     # Add files at different levels
-    (tmp_path / "level1" / "file1.txt").write_text("Level 1 file")
-    (tmp_path / "level1" / "level2" / "file2.txt").write_text("Level 2 file")
-    (tmp_path / "level1" / "level2" / "level3" / "file3.txt").write_text("Level 3 file")
+    (level1 / "file1.txt").write_bytes(b"Level 1 file")
+    (level2 / "file2.txt").write_bytes(b"Level 2 file")
+    (level3 / "file3.txt").write_bytes(b"Level 3 file")
     
     return str(tmp_path)
 
@@ -3,14 +3,25 @@ Unit tests for file_operations module.
 """
 
 import pytest
+import gzip
 import os
 import tempfile
+import shlex
 import shutil
 import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
 
-from gzip_up.file_operations import find_files_with_suffixes, generate_task_file, execute_gzip_local
+from gzip_up.file_operations import (
+    find_files_with_suffixes,
+    generate_task_file,
+    execute_gzip_local,
+    compress_file_inprocess,
+    filter_processable_files,
+    _isal_level,
+    ISAL_COMPRESSLEVEL,
+)
 
 
 class TestFindFilesWithSuffixes:
@@ -73,23 +84,86 @@ class TestFindFilesWithSuffixes:
     
     def test_find_files_with_suffixes_directory_error(self, tmp_path):
         """Test handling of directory access errors."""
-        # Mock os.walk to raise an exception
-        with patch('os.walk', side_effect=PermissionError("Access denied")):
+        # Mock os.scandir to raise an exception
+        with patch('os.scandir', side_effect=PermissionError("Access denied")):
             files = find_files_with_suffixes(str(tmp_path), {'.txt'})
             assert files == []
     
     def test_find_files_with_suffixes_sorted_output(self, tmp_path):
-        """Test that output files are sorted."""
+        """Test that output files are sorted when requested."""
         (tmp_path / "zebra.txt").write_text("content")
         (tmp_path / "apple.txt").write_text("content")
         (tmp_path / "banana.txt").write_text("content")
         
-        files = find_files_with_suffixes(str(tmp_path), {'.txt'})
+        files = find_files_with_suffixes(str(tmp_path), {'.txt'}, sort=True)
         assert len(files) == 3
         
         # Check that files are sorted
         file_names = [os.path.basename(f) for f in files]
         assert file_names == ['apple.txt', 'banana.txt', 'zebra.txt']
+    
+    def test_find_files_with_suffixes_collects_existing_gz(self, tmp_path):
+        """Test that .gz files seen during the scan are recorded."""
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "a.txt.gz").write_bytes(b"a")
+        
+        existing_gz = set()
+        files = find_files_with_suffixes(str(tmp_path), {'.txt'}, existing_gz)
+        assert files == [str(tmp_path / "a.txt")]
+        assert existing_gz == {str(tmp_path / "a.txt.gz")}
+    
+    def test_find_files_with_suffixes_collects_sizes(self, tmp_path):
+        """Test that the sizes of matching files are recorded during the scan."""
+        (tmp_path / "a.txt").write_bytes(b"x" * 10)
+        (tmp_path / "b.log").write_bytes(b"x" * 20)
+        
+        file_sizes = {}
+        find_files_with_suffixes(str(tmp_path), {'.txt'}, file_sizes=file_sizes)
+        assert file_sizes == {str(tmp_path / "a.txt"): 10}
+    
+    def test_find_files_with_suffixes_skips_symlinked_directory(self, tmp_path):
+        """Test that a symlink to a directory is neither matched nor followed."""
+        real_dir = tmp_path / "real" / "dir.fastq"
+        real_dir.mkdir(parents=True)
+        (real_dir / "inner.fastq").write_text("content")
+        work = tmp_path / "work"
+        work.mkdir()
+        (work / "linkdir.fastq").symlink_to(real_dir)
+        (work / "reads.fastq").write_text("content")
+        
+        files = find_files_with_suffixes(str(work), {'.fastq'})
+        assert files == [str(work / "reads.fastq")]
+    
+    def test_find_files_with_suffixes_sizes_follow_symlinks(self, tmp_path):
+        """Test that a symlinked input is recorded with its target's size."""
+        real_file = tmp_path / "real.bin"
+        real_file.write_bytes(b"x" * 4096)
+        (tmp_path / "link.txt").symlink_to(real_file)
+        
+        file_sizes = {}
+        find_files_with_suffixes(str(tmp_path), {'.txt'}, file_sizes=file_sizes)
+        assert file_sizes == {str(tmp_path / "link.txt"): 4096}
+    
+    def test_find_files_with_suffixes_scan_threads(self, tmp_path):
+        """Test that a concurrent scan finds the same files as a serial one."""
+        for i in range(5):
+            subdir = tmp_path / f"dir{i}" / "nested"
+            subdir.mkdir(parents=True)
+            (subdir / f"file{i}.txt").write_text("content")
+            (tmp_path / f"dir{i}" / f"other{i}.log").write_text("content")
+        
+        serial = find_files_with_suffixes(str(tmp_path), {'.txt'}, sort=True)
+        threaded = find_files_with_suffixes(str(tmp_path), {'.txt'}, sort=True, scan_threads=4)
+        assert len(serial) == 5
+        assert threaded == serial
+    
+    def test_find_files_with_suffixes_scan_threads_error(self, tmp_path):
+        """Test that an unexpected error in a scan thread stops the scan."""
+        (tmp_path / "file.txt").write_text("content")
+        
+        with patch('gzip_up.file_operations._scan_directory', side_effect=RuntimeError("boom")):
+            files = find_files_with_suffixes(str(tmp_path), {'.txt'}, scan_threads=4)
+        assert files == []
 
 
 class TestGenerateTaskFile:
@@ -100,12 +174,12 @@ class TestGenerateTaskFile:
         output_file = tmp_path / "test.cmds"
         files = []
         
-        result = generate_task_file(files, str(output_file))
+        result, _, _ = generate_task_file(files, str(output_file))
         assert result == str(output_file.absolute())
         assert output_file.exists()
         
         content = output_file.read_text()
-        assert "# Gzip task file generated by gzip-up.py" in content
+        assert "# Gzip compression task file generated by gzip-up.py" in content
         assert "parallel < gzip.cmds" in content
     
     def test_generate_task_file_single_file(self, tmp_path):
@@ -113,12 +187,13 @@ class TestGenerateTaskFile:
         output_file = tmp_path / "test.cmds"
         files = ["/path/to/file.txt"]
         
-        result = generate_task_file(files, str(output_file))
+        result, _, _ = generate_task_file(files, str(output_file))
         assert result == str(output_file.absolute())
         
         content = output_file.read_text()
         assert "gzip '/path/to/file.txt'" in content
-        assert content.count("gzip") == 1
+        command_lines = [line for line in content.split('\n') if line and not line.startswith('#')]
+        assert len(command_lines) == 1
     
     def test_generate_task_file_multiple_files(self, tmp_path):
         """Test generating task file with multiple files."""
@@ -129,14 +204,25 @@ class TestGenerateTaskFile:
             "/path/to/file3.txt"
         ]
         
-        result = generate_task_file(files, str(output_file))
+        result, _, _ = generate_task_file(files, str(output_file))
         assert result == str(output_file.absolute())
         
         content = output_file.read_text()
         assert "gzip '/path/to/file1.txt'" in content
         assert "gzip '/path/to/file2.log'" in content
         assert "gzip '/path/to/file3.txt'" in content
-        assert content.count("gzip") == 3
+        command_lines = [line for line in content.split('\n') if line and not line.startswith('#')]
+        assert len(command_lines) == 3
+    
+    def test_generate_task_file_returns_line_count(self, tmp_path):
+        """Test generate_task_file reports the task lines it wrote."""
+        output_file = tmp_path / "test.cmds"
+        files = ["/path/to/file1.txt", "/path/to/file2.txt", "/path/to/file3.txt.gz"]
+        
+        _, line_count, is_chunked = generate_task_file(files, str(output_file))
+        
+        assert line_count == 2
+        assert is_chunked is False
     
     def test_generate_task_file_skip_compressed(self, tmp_path):
         """Test that already compressed files are skipped."""
@@ -147,14 +233,15 @@ class TestGenerateTaskFile:
             "/path/to/file3.log"
         ]
         
-        result = generate_task_file(files, str(output_file))
+        result, _, _ = generate_task_file(files, str(output_file))
         assert result == str(output_file.absolute())
         
         content = output_file.read_text()
         assert "gzip '/path/to/file1.txt'" in content
         assert "gzip '/path/to/file2.gz'" not in content  # Should be skipped
         assert "gzip '/path/to/file3.log'" in content
-        assert content.count("gzip") == 2
+        command_lines = [line for line in content.split('\n') if line and not line.startswith('#')]
+        assert len(command_lines) == 2
     
     def test_generate_task_file_default_output(self, tmp_path):
         """Test generating task file with default output name."""
@@ -164,7 +251,7 @@ class TestGenerateTaskFile:
         
         try:
             files = ["/path/to/file.txt"]
-            result = generate_task_file(files)
+            result, _, _ = generate_task_file(files)
             
             # Should create gzip.cmds in current directory
             assert result == str((tmp_path / "gzip.cmds").absolute())
@@ -172,16 +259,16 @@ class TestGenerateTaskFile:
         finally:
             os.chdir(original_cwd)
     
-    def test_generate_task_file_absolute_path(self, tmp_path):
+    def test_generate_task_file_absolute_path(self, tmp_path, monkeypatch):
         """Test that output file path is converted to absolute."""
-        output_file = tmp_path / "relative" / "test.cmds"
+        monkeypatch.chdir(tmp_path)
         files = ["/path/to/file.txt"]
         
-        result = generate_task_file(files, str(output_file))
+        result, _, _ = generate_task_file(files, "test.cmds")
         
         # Result should be absolute path
         assert os.path.isabs(result)
-        assert result == str(output_file.absolute())
+        assert result == str(tmp_path / "test.cmds")
     
     def test_generate_task_file_content_structure(self, tmp_path):
         """Test the structure of generated task file content."""
@@ -193,8 +280,8 @@ class TestGenerateTaskFile:
         
         # Check header structure
         lines = content.split('\n')
-        assert lines[0] == "# Gzip task file generated by gzip-up.py"
-        assert lines[1] == "# Each line contains a gzip command to compress a file"
+        assert lines[0] == "# Gzip compression task file generated by gzip-up.py"
+        assert lines[1] == "# Each line contains a command to process a file"
         assert lines[2] == "# Run with: parallel < gzip.cmds"
         assert lines[3] == "# Or use with Slurm: srun --multi-prog gzip.cmds"
         assert lines[4] == ""
@@ -202,6 +289,145 @@ class TestGenerateTaskFile:
         # Check command line
         assert lines[5] == "gzip '/path/to/file.txt'"
 
+    def test_generate_task_file_gzip_command(self, tmp_path):
+        """Test that a custom compression command is used for task lines."""
+        output_file = tmp_path / "test.cmds"
+        files = ["/path/to/file.txt"]
+        
+        generate_task_file(files, str(output_file), gzip_command="pigz -p 8")
+        content = output_file.read_text()
+        
+        assert "pigz -p 8 '/path/to/file.txt'" in content
+    
+    def test_generate_task_file_quotes_paths(self, tmp_path):
+        """Test that single quotes in paths can't break out of the quoting."""
+        output_file = tmp_path / "test.cmds"
+        files = ["/path/to/it's; rm -rf ~.txt"]
+        
+        generate_task_file(files, str(output_file))
+        lines = output_file.read_text().split('\n')
+        
+        assert shlex.split(lines[5]) == ["gzip", files[0]]
+    
+    def test_generate_task_file_many_files(self, tmp_path):
+        """Test that every command is written when output spans several flushes."""
+        output_file = tmp_path / "test.cmds"
+        files = [f"/path/to/some/deeply/nested/directory/file{i}.txt" for i in range(5000)]
+        
+        generate_task_file(files, str(output_file))
+        lines = output_file.read_text().split('\n')
+        
+        # None of the paths exist, so all sizes tie and commands follow path order
+        assert lines[5:-1] == [f"gzip '{f}'" for f in sorted(files)]
+        assert lines[-1] == ""
+
+    def test_generate_task_file_largest_first(self, tmp_path):
+        """Test commands are written for the largest files first."""
+        output_file = tmp_path / "test.cmds"
+        files = []
+        for name, size in [("small.txt", 10), ("big.txt", 1000), ("mid.txt", 100)]:
+            (tmp_path / name).write_bytes(b"x" * size)
+            files.append(str(tmp_path / name))
+        
+        generate_task_file(files, str(output_file))
+        
+        command_lines = [line for line in output_file.read_text().split('\n') if line and not line.startswith('#')]
+        assert [line.rsplit('/', 1)[1] for line in command_lines] == ["big.txt'", "mid.txt'", "small.txt'"]
+
+    def test_generate_task_file_chunked_job_count(self, tmp_path):
+        """Test chunked task file sizes chunks from the processable files."""
+        output_file = tmp_path / "test.cmds"
+        files = [f"/path/to/file{i}.txt" for i in range(10)] + ["/path/to/done.txt.gz"]
+
+        _, line_count, is_chunked = generate_task_file(files, str(output_file), max_jobs=3)
+        content = output_file.read_text()
+
+        command_lines = [line for line in content.split('\n') if line and not line.startswith('#')]
+        assert len(command_lines) == 3
+        assert line_count == 3
+        assert is_chunked is True
+        assert sorted(line.count("gzip '") for line in command_lines) == [3, 3, 4]
+        assert "done.txt.gz" not in content
+
+    def test_generate_task_file_chunks_only_processable_files(self, tmp_path):
+        """Test that already compressed files don't push the task file into chunked mode."""
+        output_file = tmp_path / "test.cmds"
+        files = ["/path/to/a.txt", "/path/to/b.txt"] + [f"/path/to/done{i}.txt.gz" for i in range(5)]
+        
+        _, line_count, is_chunked = generate_task_file(files, str(output_file), max_jobs=3)
+        
+        assert is_chunked is False
+        assert line_count == 2
+    
+    def test_generate_task_file_chunked_balances_size(self, tmp_path):
+        """Test chunked task file spreads bytes evenly across chunks."""
+        output_file = tmp_path / "test.cmds"
+        sizes = {"big.txt": 600, "mid.txt": 300, "small1.txt": 200, "small2.txt": 100}
+        files = []
+        for name, size in sizes.items():
+            (tmp_path / name).write_bytes(b"x" * size)
+            files.append(str(tmp_path / name))
+
+        generate_task_file(files, str(output_file), max_jobs=2)
+        content = output_file.read_text()
+
+        command_lines = [line for line in content.split('\n') if line and not line.startswith('#')]
+        assert len(command_lines) == 2
+        big_line = next(line for line in command_lines if "big.txt" in line)
+        assert big_line.count("gzip '") == 1
+
+    def test_generate_task_file_independent_of_scan_order(self, tmp_path):
+        """Test that threaded scans of the same tree give byte-identical task files."""
+        tree = tmp_path / "tree"
+        for i in range(8):
+            subdir = tree / f"dir{i}"
+            subdir.mkdir(parents=True)
+            for j in range(5):
+                (subdir / f"file{j}.txt").write_bytes(b"x" * (100 if j % 2 else 10))
+        
+        for max_jobs in (None, 3):
+            outputs = []
+            for run in range(2):
+                files = find_files_with_suffixes(str(tree), {'.txt'}, scan_threads=8)
+                if run:
+                    files.reverse()
+                output_file = tmp_path / f"run{run}.cmds"
+                generate_task_file(files, str(output_file), max_jobs=max_jobs)
+                outputs.append(output_file.read_bytes())
+            assert outputs[0] == outputs[1]
+
+
+class TestFilterProcessableFiles:
+    """Test the filter_processable_files function."""
+    
+    def test_filter_processable_files_gzip(self, tmp_path):
+        """Test that compressed files and files with a .gz counterpart are dropped."""
+        (tmp_path / "a.txt").write_text("a")
+        (tmp_path / "a.txt.gz").write_bytes(b"a")
+        (tmp_path / "b.txt").write_text("b")
+        files = [str(tmp_path / "a.txt"), str(tmp_path / "a.txt.gz"), str(tmp_path / "b.txt")]
+        
+        assert filter_processable_files(files, "gzip") == [str(tmp_path / "b.txt")]
+    
+    def test_filter_processable_files_gzip_variants(self):
+        """Test that .bgz and .gzip files count as already compressed."""
+        files = ["/path/to/a.vcf.bgz", "/path/to/b.gzip", "/path/to/c.txt"]
+        
+        assert filter_processable_files(files, "gzip", set()) == ["/path/to/c.txt"]
+    
+    def test_filter_processable_files_gunzip(self):
+        """Test that only compressed files are kept in gunzip mode."""
+        files = ["/path/to/file1.txt", "/path/to/file2.gz"]
+        
+        assert filter_processable_files(files, "gunzip") == ["/path/to/file2.gz"]
+    
+    def test_filter_processable_files_known_gz(self):
+        """Test that a precollected .gz set is used instead of the filesystem."""
+        files = ["/path/to/a.txt", "/path/to/b.txt"]
+        
+        result = filter_processable_files(files, "gzip", {"/path/to/a.txt.gz"})
+        assert result == ["/path/to/b.txt"]
+
 
 class TestExecuteGzipLocal:
     """Test the execute_gzip_local function."""
@@ -219,15 +445,15 @@ class TestExecuteGzipLocal:
         # Mock successful subprocess execution
         mock_subprocess.return_value = MagicMock(returncode=0)
         
-        results = execute_gzip_local(test_files, num_threads=2)
+        results = execute_gzip_local(test_files, num_threads=2, compressor="gzip")
         
         assert results['total'] == 3
-        assert results['compressed'] == 3
+        assert results['processed'] == 3
         assert results['skipped'] == 0
         assert results['errors'] == 0
         assert len(results['error_files']) == 0
         
-        # Verify subprocess was called for each file
+        # Too few files to batch, so gzip is run once per file
         assert mock_subprocess.call_count == 3
     
     @patch('subprocess.run')
@@ -241,20 +467,20 @@ class TestExecuteGzipLocal:
         
         # Mock mixed results: first success, second error, third success
         def mock_run_side_effect(*args, **kwargs):
-            if 'file2.log' in args[0]:
+            if any('file2.log' in arg for arg in args[0]):
                 raise subprocess.CalledProcessError(1, 'gzip', stderr='Permission denied')
             return MagicMock(returncode=0)
         
         mock_subprocess.side_effect = mock_run_side_effect
         
-        results = execute_gzip_local(test_files, num_threads=1)
+        results = execute_gzip_local(test_files, num_threads=1, compressor="gzip")
         
         assert results['total'] == 3
-        assert results['compressed'] == 2
+        assert results['processed'] == 2
         assert results['skipped'] == 0
         assert results['errors'] == 1
         assert len(results['error_files']) == 1
-        assert 'file2.log' in results['error_files'][0][0]
+        assert results['error_files'] == [(test_files[1], 'Permission denied')]
     
     def test_execute_gzip_local_skip_compressed(self, tmp_path):
         """Test that already compressed files are skipped."""
@@ -265,10 +491,10 @@ class TestExecuteGzipLocal:
         ]
         
         with patch('subprocess.run', return_value=MagicMock(returncode=0)):
-            results = execute_gzip_local(test_files, num_threads=1)
+            results = execute_gzip_local(test_files, num_threads=1, compressor="gzip")
             
             assert results['total'] == 3
-            assert results['compressed'] == 2
+            assert results['processed'] == 2
             assert results['skipped'] == 1
             assert results['errors'] == 0
     
@@ -278,10 +504,12 @@ class TestExecuteGzipLocal:
         
         with patch('subprocess.run', return_value=MagicMock(returncode=0)):
             with patch('multiprocessing.cpu_count', return_value=16):
-                results = execute_gzip_local(test_files, num_threads=0)
+                with patch('gzip_up.file_operations.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as mock_executor:
+                    results = execute_gzip_local(test_files, num_threads=0, compressor="gzip")
                 
-                # Should cap at 8 threads for I/O operations
-                assert results['compressed'] == 1
+                # Should cap at 8 threads for subprocess backends
+                assert mock_executor.call_args[1]['max_workers'] == 8
+                assert results['processed'] == 1
     
     def test_execute_gzip_local_invalid_threads(self, tmp_path):
         """Test handling of invalid thread counts."""
@@ -289,20 +517,20 @@ class TestExecuteGzipLocal:
         
         with patch('subprocess.run', return_value=MagicMock(returncode=0)):
             # Test negative threads (should default to 1)
-            results = execute_gzip_local(test_files, num_threads=-1)
-            assert results['compressed'] == 1
+            results = execute_gzip_local(test_files, num_threads=-1, compressor="gzip")
+            assert results['processed'] == 1
             
             # Test zero threads (should auto-detect)
             with patch('multiprocessing.cpu_count', return_value=4):
-                results = execute_gzip_local(test_files, num_threads=0)
-                assert results['compressed'] == 1
+                results = execute_gzip_local(test_files, num_threads=0, compressor="gzip")
+                assert results['processed'] == 1
     
     def test_execute_gzip_local_empty_list(self, tmp_path):
         """Test execution with empty file list."""
         results = execute_gzip_local([], num_threads=2)
         
         assert results['total'] == 0
-        assert results['compressed'] == 0
+        assert results['processed'] == 0
         assert results['skipped'] == 0
         assert results['errors'] == 0
         assert len(results['error_files']) == 0
@@ -318,6 +546,162 @@ class TestExecuteGzipLocal:
         results = execute_gzip_local(test_files, num_threads=2)
         
         assert results['total'] == 3
-        assert results['compressed'] == 0
+        assert results['processed'] == 0
         assert results['skipped'] == 3
         assert results['errors'] == 0
+    
+    @patch('subprocess.run')
+    def test_execute_gzip_local_gzip_batches(self, mock_subprocess, tmp_path):
+        """Test that the gzip binary is handed several files per invocation."""
+        test_files = [str(tmp_path / f"file{i}.txt") for i in range(8)]
+        mock_subprocess.return_value = MagicMock(returncode=0)
+        
+        results = execute_gzip_local(test_files, num_threads=1, compressor="gzip")
+        
+        assert results['processed'] == 8
+        assert mock_subprocess.call_count == 4
+        assert mock_subprocess.call_args_list[0][0][0] == ['gzip'] + test_files[:2]
+    
+    def test_execute_gzip_local_inprocess_batches(self, tmp_path):
+        """Test that the in-process backends submit files in batches with plain arguments."""
+        test_files = [str(tmp_path / f"file{i:02d}.txt") for i in range(40)]
+        mock_batch = MagicMock(side_effect=lambda batch, *args: [(f, True, None) for f in batch])
+        
+        # Threads stand in for worker processes so the mock needn't be pickled
+        with patch('gzip_up.file_operations.ProcessPoolExecutor', ThreadPoolExecutor):
+            with patch('gzip_up.file_operations._process_batch', mock_batch):
+                results = execute_gzip_local(test_files, num_threads=2, mode_args=object(), compressor="zlib")
+        
+        assert results['processed'] == 40
+        # 40 files over 2 workers gives batches of 40 // (2 * 4) = 5
+        assert mock_batch.call_count == 8
+        assert mock_batch.call_args_list[0][0][1:] == ("gzip", "zlib", 1, None)
+    
+    @patch('subprocess.run')
+    def test_execute_gzip_local_compresslevel(self, mock_subprocess, tmp_path):
+        """Test that the compression level is passed on to the gzip binary."""
+        test_files = [str(tmp_path / "file1.txt")]
+        mock_subprocess.return_value = MagicMock(returncode=0)
+        
+        execute_gzip_local(test_files, num_threads=1, compressor="gzip", compresslevel=1)
+        
+        assert mock_subprocess.call_args[0][0] == ['gzip', '-1'] + test_files
+    
+    @patch('shutil.which', return_value='/usr/bin/pigz')
+    @patch('subprocess.run')
+    def test_execute_gzip_local_pigz_batches(self, mock_subprocess, mock_which, tmp_path):
+        """Test that pigz compresses many files per invocation."""
+        test_files = [str(tmp_path / f"file{i}.txt") for i in range(3)]
+        mock_subprocess.return_value = MagicMock(returncode=0)
+        
+        results = execute_gzip_local(test_files, num_threads=4, compressor="pigz")
+        
+        assert results['processed'] == 3
+        assert mock_subprocess.call_count == 1
+        assert mock_subprocess.call_args[0][0] == ['pigz', '-p', '4'] + test_files
+    
+    @patch('shutil.which', return_value='/usr/bin/pigz')
+    @patch('subprocess.run')
+    def test_execute_gzip_local_pigz_batch_errors(self, mock_subprocess, mock_which, tmp_path):
+        """Test that a failed pigz batch reports only the files left uncompressed."""
+        (tmp_path / "file2.txt").write_text("left behind")
+        test_files = [str(tmp_path / "file1.txt"), str(tmp_path / "file2.txt")]
+        
+        # pigz compresses file1 but fails on file2
+        def mock_run_side_effect(*args, **kwargs):
+            (tmp_path / "file1.txt.gz").write_bytes(b"done")
+            raise subprocess.CalledProcessError(1, 'pigz', stderr=b'pigz: skipping')
+        
+        mock_subprocess.side_effect = mock_run_side_effect
+        
+        results = execute_gzip_local(test_files, num_threads=1, compressor="pigz")
+        
+        assert results['processed'] == 1
+        assert results['errors'] == 1
+        assert results['error_files'] == [(str(tmp_path / "file2.txt"), 'pigz: skipping')]
+    
+    @patch('importlib.util.find_spec', return_value=None)
+    def test_execute_gzip_local_isal_fallback(self, mock_find_spec, tmp_path):
+        """Test that the isal backend falls back to zlib when isal is missing."""
+        test_file = tmp_path / "file1.txt"
+        test_file.write_text("content")
+        
+        results = execute_gzip_local([str(test_file)], num_threads=1, compressor="isal")
+        
+        assert results['processed'] == 1
+        assert results['errors'] == 0
+        assert (tmp_path / "file1.txt.gz").exists()
+
+
+class TestIsalLevel:
+    """Test the _isal_level function."""
+    
+    def test_isal_level_mapping(self):
+        """Test gzip levels 1-9 spread evenly and in order over ISA-L's 0-3."""
+        levels = [_isal_level(level) for level in range(1, 10)]
+        assert levels == [0, 0, 0, 1, 1, 2, 2, 3, 3]
+        assert _isal_level(6) == ISAL_COMPRESSLEVEL
+
+class TestCompressFileInprocess:
+    """Test the compress_file_inprocess function."""
+    
+    def test_compress_file_inprocess_roundtrip(self, tmp_path):
+        """Test that the file is replaced by a valid .gz with the same content."""
+        test_file = tmp_path / "file.txt"
+        test_file.write_text("content " * 1000)
+        
+        result = compress_file_inprocess(str(test_file))
+        
+        assert result == str(test_file) + ".gz"
+        assert not test_file.exists()
+        with gzip.open(result, 'rt') as f:
+            assert f.read() == "content " * 1000
+    
+    def test_compress_file_inprocess_keeps_owner(self, tmp_path):
+        """Test that the .gz file is given the original file's owner and group."""
+        test_file = tmp_path / "file.txt"
+        test_file.write_text("content")
+        st = test_file.stat()
+        
+        with patch('os.chown') as mock_chown:
+            result = compress_file_inprocess(str(test_file))
+        
+        mock_chown.assert_called_once_with(result, st.st_uid, st.st_gid)
+    
+    def test_compress_file_inprocess_existing_gz(self, tmp_path):
+        """Test that an existing .gz file is not overwritten."""
+        test_file = tmp_path / "file.txt"
+        test_file.write_text("content")
+        (tmp_path / "file.txt.gz").write_bytes(b"existing")
+        
+        with pytest.raises(FileExistsError):
+            compress_file_inprocess(str(test_file))
+        
+        assert test_file.exists()
+        assert (tmp_path / "file.txt.gz").read_bytes() == b"existing"
+    
+    def test_compress_file_inprocess_refuses_symlink(self, tmp_path):
+        """Test that a symlinked input is refused like gzip does, leaving both files alone."""
+        real_file = tmp_path / "real.txt"
+        real_file.write_text("content")
+        link = tmp_path / "link.txt"
+        link.symlink_to(real_file)
+        
+        with pytest.raises(ValueError, match="not a directory or a regular file"):
+            compress_file_inprocess(str(link))
+        
+        assert link.is_symlink()
+        assert real_file.read_text() == "content"
+        assert not (tmp_path / "link.txt.gz").exists()
+    
+    def test_compress_file_inprocess_refuses_hard_links(self, tmp_path):
+        """Test that a file with other hard links is refused like gzip does."""
+        test_file = tmp_path / "file.txt"
+        test_file.write_text("content")
+        os.link(test_file, tmp_path / "other.txt")
+        
+        with pytest.raises(ValueError, match="1 other link -- file ignored"):
+            compress_file_inprocess(str(test_file))
+        
+        assert test_file.read_text() == "content"
+        assert not (tmp_path / "file.txt.gz").exists()
@@ -6,12 +6,17 @@ import pytest
 import sys
 import os
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, DEFAULT
 from io import StringIO
 
 from gzip_up.main import main, validate_suffixes, create_colored_parser
 
 
+# Compression suffixes other than .gz that validation must reject. A tuple
+# rather than a set keeps parametrize ids in the same order on every run.
+_COMPRESSED_FMTS = ('.bz2', '.xz', '.zip', '.tar', '.7z', '.rar')
+
+
 class TestSuffixValidation:
     """Test the validate_suffixes function."""
     
@@ -32,13 +37,16 @@ class TestSuffixValidation:
         with pytest.raises(ValueError, match="Cannot compress already compressed .gz files"):
             validate_suffixes(['gz'])
     
-    def test_validate_suffixes_reject_other_compressed(self):
+    @pytest.mark.parametrize('fmt', _COMPRESSED_FMTS)
+    def test_validate_suffixes_reject_other_compressed(self, fmt):
         """Test that other compression formats are rejected."""
-        compressed_formats = ['.bz2', '.xz', '.zip', '.tar', '.7z', '.rar']
-        
-        for fmt in compressed_formats:
-            with pytest.raises(ValueError, match="File appears to already be compressed"):
-                validate_suffixes([fmt])
+        with pytest.raises(ValueError, match="File appears to already be compressed"):
+            validate_suffixes([fmt])
+    
+    def test_validate_suffixes_reports_all_compressed(self):
+        """Test that every compressed suffix is named in the error."""
+        with pytest.raises(ValueError, match="'.bz2', '.xz'"):
+            validate_suffixes(['.txt', 'xz', '.bz2'])
     
     def test_validate_suffixes_mixed_valid_invalid(self):
         """Test validation with mix of valid and invalid suffixes."""
@@ -80,97 +88,96 @@ class TestColoredParser:
         parser = create_colored_parser()
         
         # Check that argument groups exist
-        group_names = [group.title for group in parser._action_groups]
-        assert '[*] File Discovery Options' in group_names
-        assert '[*] Slurm Integration Options' in group_names
-        assert '[*]  Slurm Parameters' in group_names
+        group_names = {group.title for group in parser._action_groups}
+        assert {
+            'Main Options',
+            'Modes',
+            'Slurm Integration Options',
+            'Local Execution Options',
+            'Slurm Parameters',
+        } <= group_names
 
 
 class TestMainCLI:
     """Test the main CLI functionality."""
     
+    @pytest.fixture(autouse=True)
+    def _silence_ui(self, monkeypatch):
+        """Replace main()'s banner and status output with no-ops."""
+        # The package re-exports main(), so look the module up in sys.modules
+        main_module = sys.modules['gzip_up.main']
+        for name in ('print_logo', 'print_colored_banner', 'print_header', 'print_section', 'print_status'):
+            monkeypatch.setattr(main_module, name, lambda *args, **kwargs: None)
+    
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_header')
-    @patch('gzip_up.main.print_section')
-    @patch('gzip_up.main.print_status')
     @patch('gzip_up.main.print_logo')
     @patch('gzip_up.main.print_colored_banner')
-    def test_main_basic_usage(self, mock_banner, mock_logo, mock_status, mock_section, 
-                             mock_header, mock_summary, mock_gen_task, mock_find_files):
+    def test_main_basic_usage(self, mock_banner, mock_logo, mock_summary, mock_gen_task, mock_find_files):
         """Test basic CLI usage with file suffix."""
         # Mock command line arguments
-        with patch('sys.argv', ['gzip_up', '-s', '.txt']):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt']):
             # Mock return values
             mock_find_files.return_value = ['/path/to/file.txt']
-            mock_gen_task.return_value = '/path/to/gzip.cmds'
+            mock_gen_task.return_value = ('/path/to/gzip.cmds', 1, False)
             
             # Mock current directory
-            with patch('os.getcwd', return_value='/current/dir'):
-                with patch('os.path.isdir', return_value=True):
+            with patch.object(os, 'getcwd', return_value='/current/dir'):
+                with patch.object(os.path, 'isdir', return_value=True):
                     main()
         
         # Verify function calls
         mock_logo.assert_called_once()
         mock_banner.assert_called_once()
-        mock_find_files.assert_called_once_with('.', {'.txt'})
-        mock_gen_task.assert_called_once_with(['/path/to/file.txt'], 'gzip.cmds')
-        mock_summary.assert_called_once_with(['/path/to/file.txt'])
+        mock_find_files.assert_called_once_with('.', {'.txt'}, set(), scan_threads=8, file_sizes={})
+        assert mock_gen_task.call_args[0][:2] == (['/path/to/file.txt'], 'gzip.cmds')
+        mock_summary.assert_called_once_with(['/path/to/file.txt'], {})
     
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_custom_directory_and_suffixes(self, mock_banner, mock_logo, 
-                                              mock_summary, mock_gen_task, mock_find_files):
+    def test_main_custom_directory_and_suffixes(self, mock_summary, mock_gen_task, mock_find_files):
         """Test CLI with custom directory and multiple suffixes."""
         mock_find_files.return_value = ['/test/dir/file1.txt', '/test/dir/file2.log']
-        mock_gen_task.return_value = '/test/dir/gzip.cmds'
+        mock_gen_task.return_value = ('/test/dir/gzip.cmds', 1, False)
         
-        with patch('sys.argv', ['gzip_up', '-d', '/test/dir', '-s', '.txt', '.log']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-d', '/test/dir', '-s', '.txt', '.log']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
-        mock_find_files.assert_called_once_with('/test/dir', {'.txt', '.log'})
-        mock_gen_task.assert_called_once_with(
-            ['/test/dir/file1.txt', '/test/dir/file2.log'], 
-            'gzip.cmds'
-        )
+        mock_find_files.assert_called_once()
+        assert mock_find_files.call_args[0][:2] == ('/test/dir', {'.txt', '.log'})
+        mock_gen_task.assert_called_once()
+        assert mock_gen_task.call_args[0][:2] == (['/test/dir/file1.txt', '/test/dir/file2.log'], 'gzip.cmds')
     
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_custom_output_file(self, mock_banner, mock_logo, 
-                                   mock_summary, mock_gen_task, mock_find_files):
+    def test_main_custom_output_file(self, mock_summary, mock_gen_task, mock_find_files):
         """Test CLI with custom output file."""
         mock_find_files.return_value = ['/path/to/file.txt']
-        mock_gen_task.return_value = '/path/to/custom.cmds'
+        mock_gen_task.return_value = ('/path/to/custom.cmds', 1, False)
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt', '-o', 'custom.cmds']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '-o', 'custom.cmds']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
-        mock_gen_task.assert_called_once_with(['/path/to/file.txt'], 'custom.cmds')
+        mock_gen_task.assert_called_once()
+        assert mock_gen_task.call_args[0][:2] == (['/path/to/file.txt'], 'custom.cmds')
     
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.generate_slurm_script')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_with_slurm(self, mock_banner, mock_logo, mock_summary, 
-                            mock_gen_slurm, mock_gen_task, mock_find_files):
+    def test_main_with_slurm(self, mock_summary, mock_gen_slurm, mock_gen_task, mock_find_files):
         """Test CLI with Slurm script generation."""
         mock_find_files.return_value = ['/path/to/file.txt']
-        mock_gen_task.return_value = '/path/to/gzip.cmds'
+        mock_gen_task.return_value = ('/path/to/gzip.cmds', 1, False)
         mock_gen_slurm.return_value = '/path/to/gzip_slurm.sh'
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt', '--slurm']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--slurm']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
         mock_gen_slurm.assert_called_once()
@@ -182,17 +189,14 @@ class TestMainCLI:
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.generate_slurm_script')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_with_slurm_parameters(self, mock_banner, mock_logo, mock_summary, 
-                                       mock_gen_slurm, mock_gen_task, mock_find_files):
+    def test_main_with_slurm_parameters(self, mock_summary, mock_gen_slurm, mock_gen_task, mock_find_files):
         """Test CLI with Slurm parameters."""
         mock_find_files.return_value = ['/path/to/file.txt']
-        mock_gen_task.return_value = '/path/to/gzip.cmds'
+        mock_gen_task.return_value = ('/path/to/gzip.cmds', 1, False)
         mock_gen_slurm.return_value = '/path/to/gzip_slurm.sh'
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt', '--slurm', '--partition', 'short', '--ntasks', '4']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--slurm', '--partition', 'short', '--ntasks', '4']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
         # Verify Slurm args contain the specified parameters
@@ -203,94 +207,95 @@ class TestMainCLI:
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.generate_slurm_script')
-    @patch('gzip_up.main.run_on_slurm')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    @patch('builtins.input', return_value='yes')
-    def test_main_auto_run_slurm(self, mock_input, mock_banner, mock_logo, 
-                                mock_summary, mock_run_slurm, mock_gen_slurm, 
-                                mock_gen_task, mock_find_files):
-        """Test CLI with auto-run Slurm submission."""
+    def test_main_with_slurm_mem_per_cpu_and_logs(self, mock_summary, mock_gen_slurm, mock_gen_task, mock_find_files):
+        """Test that --mem-per-cpu and log options reach the Slurm script."""
         mock_find_files.return_value = ['/path/to/file.txt']
-        mock_gen_task.return_value = '/path/to/gzip.cmds'
+        mock_gen_task.return_value = ('/path/to/gzip.cmds', 1, False)
         mock_gen_slurm.return_value = '/path/to/gzip_slurm.sh'
-        mock_run_slurm.return_value = True
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt', '--slurm', '--auto-run']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--slurm', '--mem-per-cpu', '3G',
+                                '--output-log', 'run.out', '--error-log', 'run.err']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
-        mock_run_slurm.assert_called_once_with('/path/to/gzip_slurm.sh')
+        call_args = mock_gen_slurm.call_args[0][1]
+        assert call_args == {'mem_per_cpu': '3G', 'output_log': 'run.out', 'error_log': 'run.err'}
+        assert mock_gen_slurm.call_args[0][3:] == ('/path/to/gzip.cmds', 1, False)
     
     @patch('gzip_up.main.find_files_with_suffixes')
-    @patch('gzip_up.main.generate_task_file')
-    @patch('gzip_up.main.generate_slurm_script')
-    @patch('gzip_up.main.run_on_slurm')
-    @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    @patch('builtins.input', return_value='no')
-    def test_main_auto_run_cancelled(self, mock_input, mock_banner, mock_logo, 
-                                    mock_summary, mock_run_slurm, mock_gen_slurm, 
-                                    mock_gen_task, mock_find_files):
-        """Test CLI with auto-run Slurm submission cancelled."""
-        mock_find_files.return_value = ['/path/to/file.txt']
-        mock_gen_task.return_value = '/path/to/gzip.cmds'
-        mock_gen_slurm.return_value = '/path/to/gzip_slurm.sh'
+    def test_main_no_files_found(self, mock_find_files):
+        """Test CLI when no files are found."""
+        mock_find_files.return_value = []
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt', '--slurm', '--auto-run']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt']):
+            with patch.object(os.path, 'isdir', return_value=True):
+                with pytest.raises(SystemExit) as exc_info:
+                    main()
+        assert exc_info.value.code == 0
+    
+    def test_main_invalid_directory(self):
+        """Test CLI with invalid directory."""
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt']):
+            with patch.object(os.path, 'isdir', return_value=False):
+                with pytest.raises(SystemExit) as exc_info:
+                    main()
+        assert exc_info.value.code == 1
+    
+    def test_main_rejects_invalid_cpus_per_task(self):
+        """Test that a non-numeric or non-positive --cpus-per-task exits cleanly."""
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--compressor', 'pigz', '--cpus-per-task', 'four']):
+            with pytest.raises(SystemExit) as exc_info:
                 main()
+        assert exc_info.value.code == 2  # ArgumentParser error exit code
         
-        # Should not call run_on_slurm when cancelled
-        mock_run_slurm.assert_not_called()
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--compressor', 'pigz', '--cpus-per-task', '0']):
+            with patch.object(os.path, 'isdir', return_value=True):
+                with pytest.raises(SystemExit) as exc_info:
+                    main()
+        assert exc_info.value.code == 1
     
-    @patch('gzip_up.main.find_files_with_suffixes')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_no_files_found(self, mock_banner, mock_logo, mock_find_files):
-        """Test CLI when no files are found."""
-        mock_find_files.return_value = []
+    @pytest.mark.parametrize('extra_args, gzip_command', [
+        ([], 'pigz -p "${SLURM_CPUS_PER_TASK:-1}"'),
+        (['--cpus-per-task', '8'], 'pigz -p 8'),
+    ])
+    def test_main_pigz_task_command(self, extra_args, gzip_command):
+        """Test that pigz task lines take their thread count from --cpus-per-task or Slurm."""
+        mock_gen_task = MagicMock(return_value=('/path/to/gzip.cmds', 1, False))
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt']):
-            with patch('os.path.isdir', return_value=True):
-                with patch('sys.exit') as mock_exit:
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--compressor', 'pigz'] + extra_args):
+            with patch.object(os.path, 'isdir', return_value=True):
+                with patch.multiple('gzip_up.main', find_files_with_suffixes=MagicMock(return_value=['/path/to/file.txt']),
+                                    generate_task_file=mock_gen_task, display_file_summary=DEFAULT):
                     main()
-                    mock_exit.assert_called_once_with(0)
+        
+        assert mock_gen_task.call_args[0][6] == gzip_command
     
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_invalid_directory(self, mock_banner, mock_logo):
-        """Test CLI with invalid directory."""
-        with patch('sys.argv', ['gzip_up', '-s', '.txt']):
-            with patch('os.path.isdir', return_value=False):
-                with patch('sys.exit') as mock_exit:
+    def test_main_rejects_invalid_scan_threads(self):
+        """Test that a non-positive --scan-threads exits cleanly."""
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--scan-threads', '0']):
+            with patch.object(os.path, 'isdir', return_value=True):
+                with pytest.raises(SystemExit) as exc_info:
                     main()
-                    mock_exit.assert_called_once_with(1)
+        assert exc_info.value.code == 1
     
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_auto_run_without_slurm(self, mock_banner, mock_logo):
-        """Test CLI with auto-run but without slurm flag."""
-        with patch('sys.argv', ['gzip_up', '--auto-run']):
-            with patch('sys.exit') as mock_exit:
+    def test_main_rejects_unknown_option(self):
+        """Test that options main() doesn't accept, such as --auto-run, are rejected."""
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt', '--auto-run']):
+            with pytest.raises(SystemExit) as exc_info:
                 main()
-                mock_exit.assert_called_once_with(2)  # ArgumentParser error exit code
+        assert exc_info.value.code == 2  # ArgumentParser error exit code
     
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_suffix_normalization(self, mock_banner, mock_logo, 
-                                     mock_summary, mock_gen_task, mock_find_files):
+    def test_main_suffix_normalization(self, mock_summary, mock_gen_task, mock_find_files):
         """Test that suffixes are properly normalized."""
         mock_find_files.return_value = ['/path/to/file.txt']
-        mock_gen_task.return_value = '/path/to/gzip.cmds'
+        mock_gen_task.return_value = ('/path/to/gzip.cmds', 1, False)
         
-        with patch('sys.argv', ['gzip_up', '-s', '.txt']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.txt']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
         # Verify suffixes are normalized to start with dot
@@ -300,44 +305,35 @@ class TestMainCLI:
     @patch('gzip_up.main.find_files_with_suffixes')
     @patch('gzip_up.main.generate_task_file')
     @patch('gzip_up.main.display_file_summary')
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_suffix_without_dot(self, mock_banner, mock_logo, 
-                                   mock_summary, mock_gen_task, mock_find_files):
+    def test_main_suffix_without_dot(self, mock_summary, mock_gen_task, mock_find_files):
         """Test CLI with suffixes that don't start with dot."""
         mock_find_files.return_value = ['/path/to/file.txt', '/path/to/file.log']
-        mock_gen_task.return_value = '/path/to/gzip.cmds'
+        mock_gen_task.return_value = ('/path/to/gzip.cmds', 1, False)
         
-        with patch('sys.argv', ['gzip_up', '-s', 'txt', 'log']):
-            with patch('os.path.isdir', return_value=True):
+        with patch.object(sys, 'argv', ['gzip_up', '-s', 'txt', 'log']):
+            with patch.object(os.path, 'isdir', return_value=True):
                 main()
         
         # Verify suffixes are normalized to start with dot
         call_args = mock_find_files.call_args[0][1]
         assert call_args == {'.txt', '.log'}
     
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_reject_gz_suffix(self, mock_banner, mock_logo):
+    def test_main_reject_gz_suffix(self):
         """Test that .gz suffixes are rejected."""
-        with patch('sys.argv', ['gzip_up', '-s', '.gz']):
-            with patch('os.path.isdir', return_value=True):
-                with patch('sys.exit') as mock_exit:
+        with patch.object(sys, 'argv', ['gzip_up', '-s', '.gz']):
+            with patch.object(os.path, 'isdir', return_value=True):
+                with pytest.raises(SystemExit) as exc_info:
                     main()
-                    mock_exit.assert_called_once_with(1)
+        assert exc_info.value.code == 1
     
-    @patch('gzip_up.main.print_logo')
-    @patch('gzip_up.main.print_colored_banner')
-    def test_main_reject_compressed_formats(self, mock_banner, mock_logo):
+    @pytest.mark.parametrize('fmt', _COMPRESSED_FMTS)
+    def test_main_reject_compressed_formats(self, fmt):
         """Test that other compression formats are rejected."""
-        compressed_formats = ['.bz2', '.xz', '.zip', '.tar', '.7z', '.rar']
-        
-        for fmt in compressed_formats:
-            with patch('sys.argv', ['gzip_up', '-s', fmt]):
-                with patch('os.path.isdir', return_value=True):
-                    with patch('sys.exit') as mock_exit:
-                        main()
-                        mock_exit.assert_called_once_with(1)
+        with patch.object(sys, 'argv', ['gzip_up', '-s', fmt]):
+            with patch.object(os.path, 'isdir', return_value=True):
+                with pytest.raises(SystemExit) as exc_info:
+                    main()
+        assert exc_info.value.code == 1
 
 
 class TestMainIntegration:
@@ -351,18 +347,17 @@ class TestMainIntegration:
         test_file2 = tmp_path / "file2.log"
         test_file2.write_text("content2")
         
-        # Mock command line arguments
-        with patch('sys.argv', ['gzip_up', '-d', str(tmp_path), '-s', '.txt', '.log']):
-            with patch('gzip_up.main.display_file_summary') as mock_summary:
-                with patch('gzip_up.main.generate_task_file') as mock_gen_task:
-                    with patch('gzip_up.main.print_header'):
-                        with patch('gzip_up.main.print_section'):
-                            with patch('gzip_up.main.print_status'):
-                                with patch('gzip_up.main.print_logo'):
-                                    with patch('gzip_up.main.print_colored_banner'):
-                                        main()
+        mock_gen_task = MagicMock(return_value=('gzip.cmds', 2, False))
+        
+        # Mock command line arguments and everything main() prints or writes
+        with patch.object(sys, 'argv', ['gzip_up', '-d', str(tmp_path), '-s', '.txt', '.log']):
+            with patch.multiple('gzip_up.main', display_file_summary=DEFAULT, generate_task_file=mock_gen_task,
+                                print_header=DEFAULT, print_section=DEFAULT, print_status=DEFAULT,
+                                print_logo=DEFAULT, print_colored_banner=DEFAULT) as mocks:
+                main()
         
         # Verify that the workflow executed
+        mock_summary = mocks['display_file_summary']
         mock_summary.assert_called_once()
         mock_gen_task.assert_called_once()
         
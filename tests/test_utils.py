@@ -4,147 +4,186 @@ Unit tests for utils module.
 
 import pytest
 from unittest.mock import patch
-from io import StringIO
-import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from gzip_up.utils import (
     print_header,
     print_section,
     print_status,
     print_progress,
+    print_counter,
     display_file_summary,
 )
 
 
+class _MockStat:
+    """Minimal stand-in for os.stat_result carrying only st_size."""
+    
+    __slots__ = ('st_size',)
+    
+    def __init__(self, st_size):
+        self.st_size = st_size
+
+
 class TestPrintFunctions:
     """Test the print utility functions."""
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_header(self, mock_stdout):
+    def test_print_header(self, capsys):
         """Test print_header function."""
         print_header("Test Title")
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "[*] Test Title" in output
         assert "=" * 60 in output
         assert output.count("=") == 120  # 60 on each line
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_section(self, mock_stdout):
+    def test_print_section(self, capsys):
         """Test print_section function."""
         print_section("Test Section")
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "[+] Test Section" in output
         assert "-" * 40 in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_status_default(self, mock_stdout):
+    def test_print_status_default(self, capsys):
         """Test print_status function with default emoji."""
         print_status("Test message")
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "[i] Test message" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_status_custom(self, mock_stdout):
+    def test_print_status_custom(self, capsys):
         """Test print_status function with custom emoji."""
         print_status("Test message", "[OK]")
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "[OK] Test message" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_progress(self, mock_stdout):
+    def test_print_progress(self, capsys):
         """Test print_progress function."""
         print_progress(5, 10, "Test Progress")
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "Test Progress:" in output
         assert "5/10" in output
         assert "50.0%" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_print_progress_complete(self, mock_stdout):
+    def test_print_progress_complete(self, capsys):
         """Test print_progress function when complete."""
         print_progress(10, 10, "Test Progress")
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "Test Progress:" in output
         assert "10/10" in output
         assert "100.0%" in output
+    
+    def test_print_progress_skips_unchanged(self, capsys):
+        """Test print_progress only redraws when the shown percentage changes."""
+        print_progress(1, 100000, "Throttled")
+        print_progress(2, 100000, "Throttled")
+        print_progress(100, 100000, "Throttled")
+        output = capsys.readouterr().out
+        
+        assert output.count("Throttled:") == 2
+        assert "2/100000" not in output
+    
+    def test_print_progress_zero_total(self, capsys):
+        """Test print_progress prints nothing when there is no work."""
+        print_progress(0, 0, "Empty")
+        
+        assert capsys.readouterr().out == ""
+    
+    def test_print_counter(self, capsys):
+        """Test print_counter function."""
+        print_counter(2048, "Scanning files")
+        output = capsys.readouterr().out
+        
+        assert output == "\rScanning files: 2048"
 
 
 class TestDisplayFileSummary:
     """Test the display_file_summary function."""
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_display_file_summary_empty(self, mock_stdout):
+    def test_display_file_summary_empty(self, capsys):
         """Test display_file_summary with empty file list."""
         display_file_summary([])
-        output = mock_stdout.getvalue()
+        output = capsys.readouterr().out
         
         assert "[*] Total files: 0" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_display_file_summary_single_file(self, mock_stdout, tmp_path):
+    @patch('os.stat', return_value=_MockStat(len("test content")))
+    def test_display_file_summary_single_file(self, mock_stat, capsys):
         """Test display_file_summary with single file."""
-        # Create a temporary file
-        test_file = tmp_path / "test.txt"
-        test_file.write_text("test content")
+        display_file_summary(["/fake/test.txt"])
+        output = capsys.readouterr().out
         
-        display_file_summary([str(test_file)])
-        output = mock_stdout.getvalue()
+        mock_stat.assert_called_once_with("/fake/test.txt")
         
         assert "[*] Total files: 1" in output
         assert ".txt: 1 files" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_display_file_summary_multiple_files(self, mock_path, tmp_path):
+    def test_display_file_summary_uses_file_sizes(self, capsys):
+        """Test display_file_summary takes sizes from the scan instead of stat."""
+        files = ["/path/to/a.txt", "/path/to/b.txt"]
+        file_sizes = {"/path/to/a.txt": 1024 * 1024, "/path/to/b.txt": 1024 * 1024}
+        
+        with patch('os.stat') as mock_stat:
+            display_file_summary(files, file_sizes)
+        output = capsys.readouterr().out
+        
+        mock_stat.assert_not_called()
+        assert "[*] Total size: 2.00 MB" in output
+    
+    @patch('os.stat', return_value=_MockStat(1024))
+    def test_display_file_summary_multiple_files(self, mock_stat, tmp_path, capsys):
         """Test display_file_summary with multiple files of different types."""
-        # Mock Path.stat() to return a mock stat object
-        mock_stat = type('MockStat', (), {'st_size': 1024})()
-        
-        with patch('pathlib.Path.stat', return_value=mock_stat):
-            files = [
-                str(tmp_path / "file1.txt"),
-                str(tmp_path / "file2.log"),
-                str(tmp_path / "file3.txt")
-            ]
-            
+        files = [
+            str(tmp_path / "file1.txt"),
+            str(tmp_path / "file2.log"),
+            str(tmp_path / "file3.txt")
+        ]
+        
+        display_file_summary(files)
+        output = capsys.readouterr().out
+        
+        assert "[*] Total files: 3" in output
+        assert ".txt: 2 files" in output
+        assert ".log: 1 files" in output
+        assert "[*] Total size: 3.00 KB" in output
+    
+    @patch('os.stat', return_value=_MockStat(1024))
+    def test_display_file_summary_many_files(self, mock_stat, capsys):
+        """Test display_file_summary sizes long file lists on the thread pool."""
+        files = [f"/fake/file{i}.txt" for i in range(100)]
+        
+        with patch('gzip_up.utils.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as mock_executor:
             display_file_summary(files)
-            output = mock_stdout.getvalue()
-            
-            assert "[*] Total files: 3" in output
-            assert ".txt: 2 files" in output
-            assert ".log: 1 files" in output
-            assert "[*] Total size: 3.00 KB" in output
+        output = capsys.readouterr().out
+        
+        mock_executor.assert_called_once()
+        assert mock_stat.call_count == 100
+        assert "[*] Total size: 100.00 KB" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_display_file_summary_large_files(self, mock_path, tmp_path):
+    @patch('os.stat', return_value=_MockStat(2 * 1024 * 1024 * 1024))
+    def test_display_file_summary_large_files(self, mock_stat, tmp_path, capsys):
         """Test display_file_summary with large files (GB)."""
-        # Mock Path.stat() to return a large size (2 GB)
-        mock_stat = type('MockStat', (), {'st_size': 2 * 1024 * 1024 * 1024})()
+        files = [str(tmp_path / "large_file.txt")]
         
-        with patch('pathlib.Path.stat', return_value=mock_stat):
-            files = [str(tmp_path / "large_file.txt")]
-            
-            display_file_summary(files)
-            output = mock_stdout.getvalue()
-            
-            assert "[*] Total size: 2.00 GB" in output
+        display_file_summary(files)
+        output = capsys.readouterr().out
+        
+        assert "[*] Total size: 2.00 GB" in output
     
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_display_file_summary_stat_error(self, mock_path, tmp_path):
+    def test_display_file_summary_stat_error(self, tmp_path, capsys):
         """Test display_file_summary handles stat errors gracefully."""
-        # Mock Path.stat() to raise an OSError
-        with patch('pathlib.Path.stat', side_effect=OSError("Permission denied")):
+        # Mock os.stat() to raise an OSError
+        with patch('os.stat', side_effect=OSError("Permission denied")):
             files = [str(tmp_path / "file.txt")]
             
             # Should not raise an exception
             display_file_summary(files)
-            output = mock_stdout.getvalue()
+            output = capsys.readouterr().out
             
             assert "[*] Total files: 1" in output
-            # Size should be 0 due to error
-            assert "[*] Total size: 0.00 MB" in output
+            # The size is unknown, so no total size line is printed
+            assert "Total size" not in output